@@ -0,0 +1,711 @@
+import os
+import glob
+import uuid
+import sqlite3
+import json
+import datetime
+import threading
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import volcanes
+
+DIR_HISTORICO = os.path.join("data", "historico")
+RUTA_SEMILLA = os.path.join("data", "Earthquakes_posts_new.csv")  # Histórico original, usado para inicializar el almacén
+MAX_SEGMENTOS = 8  # Segmentos por partición antes de compactarla
+SIN_FECHA = "sin_fecha"
+
+# Esquema del histórico: columnas de scraping.py más las agregadas por procesado.py
+ESQUEMA = pa.schema([
+    ("titulo", pa.string()),
+    ("id", pa.string()),
+    ("nombre_completo", pa.string()),
+    ("url", pa.string()),
+    ("enlace_interno_reddit", pa.string()),
+    ("subreddit", pa.string()),
+    ("autor", pa.string()),
+    ("puntuacion", pa.int64()),
+    ("ratio_votos_positivos", pa.float64()),
+    ("num_comentarios", pa.int64()),
+    ("fecha_creacion", pa.timestamp("us")),  # UTC sin zona horaria
+    ("flair", pa.string()),
+    ("link_flair_text", pa.string()),
+    ("editado", pa.string()),  # False o timestamp de edición
+    ("media", pa.string()),
+    ("thumbnail", pa.string()),
+    ("num_crossposts", pa.int64()),
+    ("comentarios", pa.string()),
+    ("view_count", pa.float64()),
+    ("es_texto", pa.bool_()),
+    ("nsfw", pa.bool_()),
+    ("stickied", pa.bool_()),
+    ("spoiler", pa.bool_()),
+    ("locked", pa.bool_()),
+    ("distinguished", pa.string()),
+    ("texto_post", pa.string()),
+    ("ciudad_o_pais", pa.string()),
+    ("hora", pa.string()),
+    ("magnitud", pa.float64()),
+    ("tipo_magnitud", pa.string()),
+    ("latitud", pa.float64()),
+    ("longitud", pa.float64()),
+    ("fecha_crea", pa.string()),
+    ("hora_crea", pa.string()),
+])
+COLUMNAS = ESQUEMA.names
+
+# Columnas de texto pesadas: se guardan aparte, en el almacén de documentos, y se leen solo por id
+COLUMNAS_DOCUMENTOS = ["url", "media", "thumbnail", "comentarios", "texto_post"]
+ESQUEMA_EVENTOS = pa.schema([campo for campo in ESQUEMA if campo.name not in COLUMNAS_DOCUMENTOS])
+ESQUEMA_DOCUMENTOS = pa.schema([ESQUEMA.field("id"), *(ESQUEMA.field(col) for col in COLUMNAS_DOCUMENTOS)])
+COLUMNAS_EVENTOS = ESQUEMA_EVENTOS.names
+ESQUEMAS = {"eventos": ESQUEMA_EVENTOS, "documentos": ESQUEMA_DOCUMENTOS}
+
+# Columnas de la tabla eventos de SQLite, usada para las consultas filtradas del dashboard (ver consultas.py)
+COLUMNAS_CONSULTA = ["titulo", "autor", "fecha_creacion", "fecha_crea", "hora_crea", "hora",
+                     "ciudad_o_pais", "magnitud", "tipo_magnitud", "latitud", "longitud"]
+ESQUEMA_SQL = """
+CREATE TABLE IF NOT EXISTS posts (id TEXT PRIMARY KEY, particion TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS eventos (
+    id TEXT PRIMARY KEY, titulo TEXT, autor TEXT, fecha_creacion TEXT, fecha_crea TEXT, hora_crea TEXT, hora TEXT,
+    ciudad_o_pais TEXT, magnitud REAL, tipo_magnitud TEXT, latitud REAL, longitud REAL, celda INTEGER, distancia_volcan REAL
+);
+CREATE TABLE IF NOT EXISTS metadatos (clave TEXT PRIMARY KEY, valor TEXT);
+CREATE INDEX IF NOT EXISTS eventos_fecha_crea ON eventos (fecha_crea);
+CREATE INDEX IF NOT EXISTS eventos_magnitud ON eventos (magnitud);
+CREATE INDEX IF NOT EXISTS eventos_ciudad_o_pais ON eventos (ciudad_o_pais);
+CREATE INDEX IF NOT EXISTS eventos_autor ON eventos (autor);
+CREATE TABLE IF NOT EXISTS ubicaciones (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS cubo (
+    fecha TEXT NOT NULL, mes INTEGER NOT NULL, dia_semana INTEGER NOT NULL, hora INTEGER NOT NULL,
+    magnitud_centesimas INTEGER NOT NULL, oficial INTEGER NOT NULL, ubicacion_id INTEGER NOT NULL,
+    conteo INTEGER NOT NULL,
+    PRIMARY KEY (fecha, hora, magnitud_centesimas, oficial, ubicacion_id)
+) WITHOUT ROWID;
+"""
+
+AUTOR_OFICIAL = "BrainstormBot"
+
+# Grilla espacial jerárquica: cada evento guarda la celda de nivel NIVEL_CELDA que contiene
+# sus coordenadas, con los bits de latitud y longitud intercalados (código Morton, como un
+# geohash). La celda de un nivel menor n es celda >> 2 * (NIVEL_CELDA - n).
+NIVEL_CELDA = 16
+
+# Mismas condiciones de validez que paginas.utils.load_data: coordenadas y magnitud válidas.
+# El + unario evita que SQLite use el índice de magnitud para esta condición, que casi no descarta
+# filas, y elija en cambio el índice del filtro que la acompaña.
+CONDICION_VALIDOS = (
+    "latitud BETWEEN -90 AND 90 AND longitud BETWEEN -180 AND 180 "
+    "AND +magnitud > 1 AND +magnitud < 15"
+)
+
+# Cubo de conteos por celda (fecha, mes, día de la semana, hora, magnitud en centésimas, oficial, ubicación).
+# Los valores faltantes se guardan como '' / 0 / -1 porque SQLite no compara NULL en la clave primaria.
+SQL_CUBO = f"""
+INSERT INTO cubo (fecha, mes, dia_semana, hora, magnitud_centesimas, oficial, ubicacion_id, conteo)
+SELECT
+    COALESCE(e.fecha_crea, ''),
+    COALESCE(CAST(substr(e.fecha_crea, 1, 4) || substr(e.fecha_crea, 6, 2) AS INTEGER), 0),
+    COALESCE((CAST(strftime('%w', e.fecha_crea) AS INTEGER) + 6) % 7, -1),
+    CASE WHEN trim(e.hora_crea) GLOB '[0-2][0-9]:[0-5][0-9]:[0-5][0-9]' THEN CAST(substr(trim(e.hora_crea), 1, 2) AS INTEGER) ELSE -1 END,
+    CAST(ROUND(e.magnitud * 100) AS INTEGER),
+    COALESCE(e.autor = ?, 0),
+    u.id,
+    COUNT(*)
+FROM (SELECT * FROM eventos WHERE rowid > ? AND {CONDICION_VALIDOS}) e
+JOIN ubicaciones u ON u.nombre = COALESCE(e.ciudad_o_pais, '')
+GROUP BY 1, 2, 3, 4, 5, 6, 7
+ON CONFLICT (fecha, hora, magnitud_centesimas, oficial, ubicacion_id) DO UPDATE SET conteo = conteo + excluded.conteo
+"""
+
+_lock_compactacion = threading.Lock()
+_lock_preparacion = threading.Lock()
+_bases_preparadas = set()  # Bases SQLite con el esquema y las migraciones ya aplicados en este proceso
+_almacenes_inicializados = set()  # Almacenes ya revisados por inicializar_almacen en este proceso
+
+
+def _ruta(*partes):
+    return os.path.join(os.getcwd(), DIR_HISTORICO, *partes)
+
+
+def _abrir_indice():
+    """
+    Abre la base SQLite del almacén y registra las funciones SQL que usan las
+    consultas, sin tocar el esquema.
+    """
+    conexion = sqlite3.connect(_ruta("indice.sqlite"))
+    conexion.create_function("distancia_km", 4, _distancia_km, deterministic=True)
+    conexion.create_function("en_poligono", 3, _en_poligono, deterministic=True)
+    return conexion
+
+
+def _conectar_indice():
+    """
+    Abre la base SQLite del almacén y, la primera vez en el proceso, crea las
+    tablas si no existen (el índice de posts guardados, id de Reddit ->
+    partición, y la tabla eventos, con índices en las columnas que filtra el
+    dashboard) y aplica las migraciones.
+    """
+    os.makedirs(_ruta(), exist_ok=True)
+    ruta = _ruta("indice.sqlite")
+    conexion = _abrir_indice()
+    with _lock_preparacion:
+        if ruta not in _bases_preparadas:
+            conexion.executescript(ESQUEMA_SQL)
+            _migrar_celdas(conexion)
+            _actualizar_distancias_volcanes(conexion)
+            _bases_preparadas.add(ruta)
+    return conexion
+
+
+def _distancia_km(latitud, longitud, latitud_punto, longitud_punto):
+    """
+    Distancia haversine para usar en SQL como distancia_km(latitud, longitud, lat, lon).
+    """
+    if latitud is None or longitud is None:
+        return None
+    return float(volcanes.distancia_km(latitud, longitud, latitud_punto, longitud_punto))
+
+
+@lru_cache(maxsize=16)
+def _vertices(poligono):
+    return json.loads(poligono)
+
+
+def _en_poligono(latitud, longitud, poligono):
+    """
+    Indica si un punto está dentro de un polígono (regla par-impar), para usar en
+    SQL como en_poligono(latitud, longitud, '[[lat, lon], ...]').
+    """
+    if latitud is None or longitud is None:
+        return 0
+    vertices = _vertices(poligono)
+    dentro = False
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, vertices[1:] + vertices[:1]):
+        if (lat1 > latitud) != (lat2 > latitud) and longitud < lon1 + (latitud - lat1) * (lon2 - lon1) / (lat2 - lat1):
+            dentro = not dentro
+    return int(dentro)
+
+
+def _intercalar_bits(valores):
+    """
+    Separa los bits de enteros de 16 bits con un cero entre cada uno.
+    """
+    valores = valores.astype(np.uint64) & 0xFFFF
+    valores = (valores | (valores << 8)) & 0x00FF00FF
+    valores = (valores | (valores << 4)) & 0x0F0F0F0F
+    valores = (valores | (valores << 2)) & 0x33333333
+    valores = (valores | (valores << 1)) & 0x55555555
+    return valores
+
+
+def celda_espacial(latitud, longitud):
+    """
+    Calcula de forma vectorizada la celda de la grilla espacial (nivel
+    NIVEL_CELDA) de cada par de coordenadas.
+
+    Args:
+        latitud (array-like): Latitudes en grados
+        longitud (array-like): Longitudes en grados
+
+    Returns:
+        pandas.Series: Celda de cada coordenada (Int64), nula si falta alguna
+                       coordenada o está fuera de rango
+    """
+    latitud = pd.to_numeric(pd.Series(latitud), errors="coerce").to_numpy(dtype=np.float64)
+    longitud = pd.to_numeric(pd.Series(longitud), errors="coerce").to_numpy(dtype=np.float64)
+    validas = (np.abs(latitud) <= 90) & (np.abs(longitud) <= 180)  # Falso también para NaN
+    lado = 1 << NIVEL_CELDA
+    fila = np.clip(np.floor((np.nan_to_num(latitud) + 90) / 180 * lado), 0, lado - 1)
+    columna = np.clip(np.floor((np.nan_to_num(longitud) + 180) / 360 * lado), 0, lado - 1)
+    celdas = (_intercalar_bits(fila) << 1) | _intercalar_bits(columna)
+    return pd.Series(celdas.astype(np.int64), dtype="Int64").where(validas)
+
+
+def _migrar_celdas(conexion):
+    """
+    Agrega la columna celda a la tabla eventos de almacenes anteriores,
+    calculándola para los eventos existentes, y crea su índice.
+    """
+    columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(eventos)")]
+    if "celda" not in columnas:
+        filas = pd.read_sql_query("SELECT rowid, latitud, longitud FROM eventos", conexion)
+        celdas = celda_espacial(filas["latitud"], filas["longitud"]).astype(object).where(lambda c: c.notna(), None)
+        with conexion:
+            conexion.execute("ALTER TABLE eventos ADD COLUMN celda INTEGER")
+            conexion.executemany("UPDATE eventos SET celda = ? WHERE rowid = ?", zip(celdas, filas["rowid"].tolist()))
+    conexion.execute("CREATE INDEX IF NOT EXISTS eventos_celda ON eventos (celda)")
+
+
+def rangos_celdas(lat_min, lat_max, lon_min, lon_max, max_celdas=64):
+    """
+    Cubre un rectángulo de coordenadas con celdas de la grilla espacial, del
+    nivel más fino que no supere max_celdas, y las devuelve como rangos de la
+    columna celda (cada celda de nivel n es un rango contiguo de celdas de
+    nivel NIVEL_CELDA). Sirve para que SQLite lea con el índice solo las
+    celdas candidatas de una región.
+
+    Args:
+        lat_min (float): Latitud mínima en grados
+        lat_max (float): Latitud máxima en grados
+        lon_min (float): Longitud mínima en grados (-180 a 180)
+        lon_max (float): Longitud máxima en grados; si es menor que lon_min el
+                         rectángulo cruza el antimeridiano
+        max_celdas (int): Máximo de celdas de la cobertura
+
+    Returns:
+        list: Rangos (desde, hasta) inclusivos de la columna celda, ordenados y sin solaparse
+    """
+    tramos = [(lon_min, lon_max)] if lon_min <= lon_max else [(lon_min, 180.0), (-180.0, lon_max)]
+    for nivel in range(NIVEL_CELDA, -1, -1):
+        lado = 1 << nivel
+        filas = np.arange(*np.clip(np.floor((np.array([lat_min, lat_max]) + 90) / 180 * lado), 0, lado - 1).astype(np.int64) + [0, 1])
+        columnas = np.concatenate([
+            np.arange(*np.clip(np.floor((np.array(tramo) + 180) / 360 * lado), 0, lado - 1).astype(np.int64) + [0, 1])
+            for tramo in tramos
+        ])
+        if len(filas) * len(columnas) <= max_celdas or nivel == 0:
+            break
+    desplazamiento = 2 * (NIVEL_CELDA - nivel)
+    celdas = np.unique((_intercalar_bits(np.repeat(filas, len(columnas))) << 1) | _intercalar_bits(np.tile(columnas, len(filas)))).astype(np.int64)
+    rangos = []
+    for celda in celdas.tolist():
+        desde, hasta = celda << desplazamiento, ((celda + 1) << desplazamiento) - 1
+        if rangos and rangos[-1][1] + 1 == desde:  # Celdas consecutivas: un solo rango
+            rangos[-1] = (rangos[-1][0], hasta)
+        else:
+            rangos.append((desde, hasta))
+    return rangos
+
+
+def _actualizar_distancias_volcanes(conexion):
+    """
+    Agrega a la tabla eventos de almacenes anteriores la columna
+    distancia_volcan (km al volcán más cercano) y la recalcula para todos los
+    eventos cuando cambia el archivo de volcanes. Se revisa al preparar la base
+    y al ingresar posts, no en cada consulta.
+    """
+    columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(eventos)")]
+    if "distancia_volcan" not in columnas:
+        with conexion:
+            conexion.execute("ALTER TABLE eventos ADD COLUMN distancia_volcan REAL")
+    datos = volcanes.cargar_volcanes()
+    version = str(datos.mtime) if datos is not None else ""
+    guardada = conexion.execute("SELECT valor FROM metadatos WHERE clave = 'volcanes'").fetchone()
+    if guardada is None or guardada[0] != version:
+        filas = pd.read_sql_query("SELECT rowid, latitud, longitud FROM eventos", conexion)
+        distancias, _ = volcanes.volcan_mas_cercano(filas["latitud"], filas["longitud"], datos)
+        with conexion:
+            conexion.executemany("UPDATE eventos SET distancia_volcan = ? WHERE rowid = ?",
+                                 zip(pd.Series(distancias).astype(object).where(lambda d: d.notna(), None), filas["rowid"].tolist()))
+            conexion.execute("INSERT OR REPLACE INTO metadatos (clave, valor) VALUES ('volcanes', ?)", [version])
+    conexion.execute("CREATE INDEX IF NOT EXISTS eventos_distancia_volcan ON eventos (distancia_volcan)")
+
+
+def _registrar_eventos(conexion, df, claves):
+    """
+    Inserta en la tabla eventos de SQLite las columnas de consulta de los posts
+    y suma las filas nuevas al cubo de conteos.
+    """
+    ultimo = conexion.execute("SELECT COALESCE(MAX(rowid), 0) FROM eventos").fetchone()[0]
+    eventos = df.reindex(columns=COLUMNAS_CONSULTA).copy()
+    eventos["fecha_creacion"] = pd.to_datetime(eventos["fecha_creacion"], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+    eventos = eventos.astype(object).where(eventos.notna(), None)
+    eventos["celda"] = celda_espacial(eventos["latitud"], eventos["longitud"]).astype(object).where(lambda c: c.notna(), None).values
+    distancias, _ = volcanes.volcan_mas_cercano(eventos["latitud"], eventos["longitud"])
+    eventos["distancia_volcan"] = pd.Series(distancias).astype(object).where(lambda d: d.notna(), None).values
+    eventos.insert(0, "id", claves.loc[df.index].values)
+    marcadores = ",".join("?" * len(eventos.columns))
+    conexion.executemany(
+        f"INSERT OR IGNORE INTO eventos ({', '.join(eventos.columns)}) VALUES ({marcadores})",
+        eventos.itertuples(index=False, name=None)
+    )
+    _actualizar_cubo(conexion, ultimo)
+
+
+def _actualizar_cubo(conexion, desde_rowid=0):
+    """
+    Suma al cubo de conteos los eventos con rowid mayor a desde_rowid. Como la
+    tabla eventos solo recibe inserciones, cada actualización procesa solo las
+    filas nuevas.
+    """
+    conexion.execute("INSERT OR IGNORE INTO ubicaciones (nombre) SELECT DISTINCT COALESCE(ciudad_o_pais, '') FROM eventos WHERE rowid > ?", [desde_rowid])
+    conexion.execute(SQL_CUBO, [AUTOR_OFICIAL, desde_rowid])
+
+
+def conectar():
+    """
+    Abre la base SQLite del almacén para consultas (ver consultas.py). Solo
+    la primera llamada del proceso crea o revisa el almacén; las siguientes
+    abren la conexión directamente.
+
+    Returns:
+        sqlite3.Connection: Conexión a data/historico/indice.sqlite
+    """
+    if _ruta("indice.sqlite") not in _almacenes_inicializados:
+        inicializar_almacen()
+    return _abrir_indice()
+
+
+def _claves(df):
+    """
+    Devuelve la clave de cada post: su id de Reddit o, si no lo tiene, el título.
+    """
+    if "id" not in df.columns:
+        return "titulo:" + df["titulo"].astype(str)
+    return df["id"].astype("string").fillna("titulo:" + df["titulo"].astype(str)).astype(str)
+
+
+def _particiones(fechas):
+    """
+    Calcula la partición mensual ("YYYY-MM") de cada fecha de creación.
+    """
+    return pd.to_datetime(fechas, errors="coerce").dt.strftime("%Y-%m").fillna(SIN_FECHA)
+
+
+def _particion_de(ruta):
+    return os.path.basename(os.path.dirname(ruta)).split("=", 1)[1]
+
+
+def _segmentos(particion="*", tipo="eventos", extension="parquet"):
+    return sorted(glob.glob(_ruta(f"particion={particion}", f"{tipo}-*.{extension}")))
+
+
+def _tabla(df, esquema=ESQUEMA):
+    """
+    Convierte un DataFrame de posts en una tabla de Arrow con el esquema dado.
+    Las columnas que faltan quedan nulas y las que no están en el esquema se
+    descartan.
+    """
+    columnas = {}
+    for campo in esquema:
+        valores = df[campo.name] if campo.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if pa.types.is_string(campo.type):
+            valores = valores.where(valores.isna(), valores.astype(str)).astype(object)  # Textos mixtos (bool, float, objetos de praw) como string
+            valores = valores.where(valores.notna(), None)
+        elif pa.types.is_boolean(campo.type):
+            valores = valores.replace({"True": True, "False": False}).astype("boolean")
+        elif pa.types.is_timestamp(campo.type):
+            valores = pd.to_datetime(valores, errors="coerce")
+        else:
+            valores = pd.to_numeric(valores, errors="coerce")
+            if pa.types.is_integer(campo.type):
+                valores = valores.astype("Int64")
+        columnas[campo.name] = pa.Array.from_pandas(valores, type=campo.type)
+    return pa.Table.from_pydict(columnas, schema=esquema)
+
+
+def _escribir_parquet(df, particion, tipo, sello):
+    """
+    Escribe un archivo Parquet de la partición con el esquema del tipo dado
+    ("eventos" o "documentos"). El archivo se escribe con otro nombre y se
+    renombra al final para que los lectores nunca vean uno a medio escribir.
+    """
+    directorio = _ruta(f"particion={particion}")
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"{tipo}-{sello}.parquet"
+    temporal = os.path.join(directorio, f".{nombre}.tmp")
+    pq.write_table(_tabla(df, ESQUEMAS[tipo]), temporal, compression="zstd")
+    os.replace(temporal, os.path.join(directorio, nombre))
+    return os.path.join(directorio, nombre)
+
+
+def _escribir_segmento(df, particion):
+    """
+    Escribe un DataFrame de posts como un nuevo segmento de la partición: un
+    archivo de eventos (columnas livianas) y uno de documentos (textos
+    pesados por id). Los documentos se escriben primero, así todo evento
+    visible tiene sus documentos disponibles.
+    """
+    sello = f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    _escribir_parquet(df, particion, "documentos", sello)
+    return _escribir_parquet(df, particion, "eventos", sello)
+
+
+def _leer(tipo="eventos", particiones=("*",), columnas=None, filtro=None):
+    """
+    Lee los segmentos de un tipo en las particiones dadas, solo con las
+    columnas pedidas y las filas que cumplen el filtro de Arrow.
+    """
+    for intento in range(3):
+        rutas = [ruta for particion in particiones for ruta in _segmentos(particion, tipo)]
+        if not rutas:
+            return ESQUEMAS[tipo].empty_table().select(columnas or ESQUEMAS[tipo].names).to_pandas()
+        try:
+            return ds.dataset(rutas, schema=ESQUEMAS[tipo], format="parquet").to_table(columns=columnas, filter=filtro).to_pandas()
+        except FileNotFoundError:  # Una compactación reemplazó los segmentos mientras se leían
+            if intento == 2:
+                raise
+
+
+def _migrar_segmentos_anteriores():
+    """
+    Convierte los segmentos de versiones anteriores del almacén (CSV, o
+    Parquet con todas las columnas juntas) al formato de eventos y documentos.
+    """
+    for extension in ("csv", "parquet"):
+        for ruta in _segmentos(tipo="segmento", extension=extension):
+            df = pd.read_csv(ruta) if extension == "csv" else pd.read_parquet(ruta)
+            _escribir_segmento(_preparar(df), _particion_de(ruta))
+            os.remove(ruta)
+
+
+def _preparar(df):
+    """
+    Normaliza un DataFrame de posts antes de guardarlo: fecha_creacion tz-naive
+    y columnas de fecha/hora y numéricas completas.
+    """
+    df = df.reset_index(drop=True)
+    df["fecha_creacion"] = pd.to_datetime(df["fecha_creacion"], errors="coerce")
+    if df["fecha_creacion"].dt.tz is not None:  # Convertir fechas con zona horaria a tz-naive
+        df["fecha_creacion"] = df["fecha_creacion"].dt.tz_localize(None)
+
+    if "fecha_crea" not in df.columns:
+        df["fecha_crea"] = df["fecha_creacion"].dt.strftime("%Y-%m-%d")
+    if "hora_crea" not in df.columns:
+        df["hora_crea"] = df["fecha_creacion"].dt.strftime("%H:%M:%S")
+    if "hora" not in df.columns:
+        df["hora"] = df["fecha_creacion"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    if "ciudad_o_pais" not in df.columns:
+        df["ciudad_o_pais"] = ""
+    for col in ["magnitud", "latitud", "longitud"]:
+        if col not in df.columns:
+            df[col] = 0 if col == "magnitud" else float("nan")
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["magnitud"] = df["magnitud"].fillna(0)
+    return df
+
+
+def inicializar_almacen():
+    """
+    Crea el almacén particionado a partir del CSV histórico original si todavía
+    no existe. Solo se ejecuta una vez: las siguientes llamadas no hacen nada,
+    y la revisión de un almacén existente se hace una vez por proceso.
+
+    Returns:
+        bool: True si se inicializó en esta llamada
+    """
+    ruta = _ruta("indice.sqlite")
+    if os.path.exists(ruta):
+        if ruta not in _almacenes_inicializados:
+            _migrar_segmentos_anteriores()
+            _completar_eventos()
+            _almacenes_inicializados.add(ruta)
+        return False
+
+    _bases_preparadas.discard(ruta)  # El almacén se borró: volver a crear el esquema
+
+    ruta_semilla = os.path.join(os.getcwd(), RUTA_SEMILLA)
+    if not os.path.exists(ruta_semilla):
+        raise FileNotFoundError(f"El archivo {ruta_semilla} no existe.")
+
+    semilla = pd.read_csv(ruta_semilla)
+    semilla = semilla.loc[~_claves(semilla).duplicated()]
+    _guardar(_preparar(semilla))
+    print(f"Almacén inicializado desde {RUTA_SEMILLA} - shape: {semilla.shape}")
+    _almacenes_inicializados.add(ruta)
+    return True
+
+
+def _completar_eventos():
+    """
+    Llena la tabla eventos de SQLite desde los segmentos Parquet, y el cubo
+    desde la tabla eventos, si están vacíos (almacenes creados antes de que
+    existieran).
+    """
+    conexion = _conectar_indice()
+    vacia = conexion.execute("SELECT NOT EXISTS (SELECT 1 FROM eventos)").fetchone()[0]
+    if vacia and _segmentos():
+        df = _leer("eventos", columnas=list(dict.fromkeys(["id", *COLUMNAS_CONSULTA])))
+        with conexion:
+            _registrar_eventos(conexion, df, _claves(df))
+    elif conexion.execute("SELECT NOT EXISTS (SELECT 1 FROM cubo)").fetchone()[0]:  # Cubo de un almacén anterior
+        with conexion:
+            _actualizar_cubo(conexion)
+    conexion.close()
+
+
+def _guardar(df):
+    """
+    Escribe un segmento por partición y registra las claves en el índice y
+    los eventos en la tabla de consultas.
+    """
+    claves = _claves(df)
+    particiones = _particiones(df["fecha_creacion"])
+    conexion = _conectar_indice()
+    _actualizar_distancias_volcanes(conexion)  # Al ingresar posts, recalcular si cambió el archivo de volcanes
+    for particion, grupo in df.groupby(particiones, sort=False):
+        _escribir_segmento(grupo, particion)
+        with conexion:  # Registrar las claves solo después de escribir el segmento
+            conexion.executemany(
+                "INSERT OR IGNORE INTO posts (id, particion) VALUES (?, ?)",
+                [(clave, particion) for clave in claves[grupo.index]]
+            )
+            _registrar_eventos(conexion, grupo, claves)
+    conexion.close()
+    return particiones.unique().tolist()
+
+
+def claves_existentes(claves):
+    """
+    Consulta en el índice cuáles de las claves ya están guardadas.
+
+    Args:
+        claves (list): Claves de posts (id de Reddit)
+
+    Returns:
+        set: Claves que ya existen en el almacén
+    """
+    claves = list(dict.fromkeys(claves))
+    existentes = set()
+    conexion = _conectar_indice()
+    for inicio in range(0, len(claves), 500):  # Consultar por tramos para no exceder el límite de parámetros
+        tramo = claves[inicio:inicio + 500]
+        marcadores = ",".join("?" * len(tramo))
+        existentes.update(fila[0] for fila in conexion.execute(f"SELECT id FROM posts WHERE id IN ({marcadores})", tramo))
+    conexion.close()
+    return existentes
+
+
+def agregar_posts(df_nuevo, en_segundo_plano=True):
+    """
+    Agrega al almacén solo los posts cuyo id no está en el índice, como nuevos
+    segmentos de su partición mensual. El costo depende del número de posts
+    nuevos y no del tamaño del histórico. Las particiones con demasiados
+    segmentos se compactan después, en un hilo aparte.
+
+    Args:
+        df_nuevo (pandas.DataFrame): Posts procesados
+        en_segundo_plano (bool): Si True, la compactación se hace en otro hilo
+
+    Returns:
+        pandas.DataFrame: Posts efectivamente agregados
+    """
+    inicializar_almacen()
+    if df_nuevo.empty:
+        return df_nuevo
+
+    claves = _claves(df_nuevo)
+    nuevos = ~claves.duplicated() & ~claves.isin(claves_existentes(claves.tolist()))
+    df_agregado = _preparar(df_nuevo.loc[nuevos])
+    if df_agregado.empty:
+        return df_agregado
+
+    particiones = _guardar(df_agregado)
+    compactar([particion for particion in particiones if len(_segmentos(particion)) > MAX_SEGMENTOS], en_segundo_plano)
+    return df_agregado
+
+
+def compactar_particion(particion):
+    """
+    Une todos los segmentos de una partición en uno solo, ordenado por fecha.
+    El segmento compactado se escribe antes de borrar los anteriores; los
+    lectores eliminan los duplicados que puedan ver durante el reemplazo.
+
+    Args:
+        particion (str): Partición a compactar ("YYYY-MM")
+    """
+    eventos = _segmentos(particion, "eventos")
+    documentos = _segmentos(particion, "documentos")
+    if len(eventos) <= 1:
+        return
+    df = _leer("eventos", [particion])
+    df = df.loc[~_claves(df).duplicated()].sort_values("fecha_creacion", ascending=False)
+    textos = _leer("documentos", [particion])
+    textos = textos.dropna(subset=["id"]).drop_duplicates(subset=["id"])
+    df = df.merge(textos, on="id", how="left")
+    _escribir_segmento(df, particion)
+    for ruta in eventos + documentos:
+        os.remove(ruta)
+
+
+def compactar(particiones=None, en_segundo_plano=False):
+    """
+    Compacta las particiones indicadas (o todas), opcionalmente en un hilo aparte.
+
+    Args:
+        particiones (list): Particiones a compactar; None para todas
+        en_segundo_plano (bool): Si True, se ejecuta en un hilo daemon
+
+    Returns:
+        threading.Thread: Hilo lanzado, o None si se ejecutó en el hilo actual
+    """
+    if particiones is None:
+        particiones = sorted({_particion_de(ruta) for ruta in _segmentos()})
+    if not particiones:
+        return None
+
+    def tarea():
+        with _lock_compactacion:  # Una sola compactación a la vez
+            for particion in particiones:
+                compactar_particion(particion)
+
+    if en_segundo_plano:
+        hilo = threading.Thread(target=tarea, name="compactacion-historico", daemon=True)
+        hilo.start()
+        return hilo
+    tarea()
+    return None
+
+
+def leer_historico(columnas=None):
+    """
+    Lee la tabla de eventos del histórico desde los segmentos Parquet del
+    almacén. Solo se leen del disco las columnas pedidas (más id, titulo y
+    fecha_creacion, necesarias para eliminar duplicados y ordenar). Las
+    columnas de texto pesadas se leen aparte con leer_documentos.
+
+    Args:
+        columnas (list): Columnas de eventos a leer; None para todas (COLUMNAS_EVENTOS)
+
+    Returns:
+        pandas.DataFrame: Todos los posts guardados, sin duplicados y ordenados
+                         por fecha de creación (más reciente primero)
+
+    Raises:
+        FileNotFoundError: Si no existe el almacén ni el CSV histórico para crearlo
+    """
+    inicializar_almacen()
+    if columnas is not None:
+        columnas = list(dict.fromkeys(["id", "titulo", "fecha_creacion", *columnas]))
+    df = _leer("eventos", columnas=columnas)
+    df = df.loc[~_claves(df).duplicated()]
+    return df.sort_values("fecha_creacion", ascending=False).reset_index(drop=True)
+
+
+def leer_documentos(ids, columnas=None):
+    """
+    Lee las columnas de texto pesadas (texto_post, comentarios, media,
+    thumbnail, url) solo de los posts pedidos. El índice de ids indica en qué
+    particiones están, así no se abren los documentos de todo el histórico.
+
+    Args:
+        ids (list): Ids de Reddit de los posts
+        columnas (list): Columnas de COLUMNAS_DOCUMENTOS a leer; None para todas
+
+    Returns:
+        pandas.DataFrame: DataFrame con la columna id y las columnas pedidas,
+                         una fila por id encontrado
+    """
+    inicializar_almacen()
+    columnas = ["id", *(columnas if columnas is not None else COLUMNAS_DOCUMENTOS)]
+    ids = pd.Series(ids, dtype=object).dropna().astype(str).unique().tolist()
+    if not ids:
+        return ESQUEMA_DOCUMENTOS.empty_table().select(columnas).to_pandas()
+
+    particiones = set()
+    conexion = _conectar_indice()
+    for inicio in range(0, len(ids), 500):  # Consultar por tramos para no exceder el límite de parámetros
+        tramo = ids[inicio:inicio + 500]
+        marcadores = ",".join("?" * len(tramo))
+        particiones.update(fila[0] for fila in conexion.execute(f"SELECT DISTINCT particion FROM posts WHERE id IN ({marcadores})", tramo))
+    conexion.close()
+    if not particiones:
+        return ESQUEMA_DOCUMENTOS.empty_table().select(columnas).to_pandas()
+
+    documentos = _leer("documentos", sorted(particiones), columnas, ds.field("id").isin(ids))
+    return documentos.drop_duplicates(subset=["id"]).reset_index(drop=True)
@@ -0,0 +1,203 @@
+"""
+Benchmarks de las etapas del pipeline de datos.
+
+Uso:
+    python benchmark.py
+"""
+
+import os
+import re
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import almacen
+import graficos
+from procesado import normalizar_fechas_reddit
+
+
+def generar_posts(n, semilla=0):
+    """
+    Genera un DataFrame sintético de n posts con el formato de datos_reddit.csv,
+    reutilizando títulos y textos reales del histórico. La mitad de las fechas
+    de creación son timestamps Unix y la otra mitad strings.
+
+    Args:
+        n (int): Número de posts a generar
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        pandas.DataFrame: DataFrame con columnas titulo, texto_post y fecha_creacion
+    """
+    historico = pd.read_csv(os.path.join(os.getcwd(), "data", "Earthquakes_posts_new.csv"), usecols=["titulo", "texto_post", "fecha_creacion"])
+    rng = np.random.default_rng(semilla)
+    filas = rng.integers(0, len(historico), n)
+
+    df = historico.iloc[filas].reset_index(drop=True)
+    fechas = pd.to_datetime(df["fecha_creacion"], errors="coerce")
+    timestamps = fechas.astype("int64") // 10**9
+    usar_timestamp = (rng.random(n) < 0.5) & fechas.notna().to_numpy()
+    df["fecha_creacion"] = df["fecha_creacion"].astype(object)
+    df.loc[usar_timestamp, "fecha_creacion"] = timestamps[usar_timestamp].astype(float)
+    return df
+
+
+def fechas_por_fila(df):
+    """
+    Implementación anterior de la extracción de fechas (iterrows + re.search +
+    to_datetime por fila), usada como referencia en el benchmark.
+
+    Args:
+        df (pandas.DataFrame): DataFrame con columnas texto_post y fecha_creacion
+
+    Returns:
+        pandas.DataFrame: DataFrame con fecha_crea y hora_crea
+    """
+    df = df.copy()
+    df["fecha_creacion"] = pd.to_datetime(pd.to_numeric(df["fecha_creacion"], errors="coerce"), unit="s")
+    df["fecha_crea"] = df["fecha_creacion"].dt.strftime("%Y-%m-%d")
+    df["hora_crea"] = df["fecha_creacion"].dt.strftime("%H:%M:%S")
+    for idx, row in df.iterrows():
+        match = re.search(r'(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})\s*UTC', row["texto_post"] if isinstance(row["texto_post"], str) else "")
+        if match:
+            fecha_hora = pd.to_datetime(match.group(1))
+            df.at[idx, "fecha_crea"] = fecha_hora.strftime("%Y-%m-%d")
+            df.at[idx, "hora_crea"] = fecha_hora.strftime("%H:%M:%S")
+    return df
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    funcion(*args)
+    return time.perf_counter() - inicio
+
+
+def benchmark_fechas_reddit(tamanos=(1_000, 10_000, 100_000, 1_000_000), max_por_fila=10_000):
+    """
+    Mide el tiempo de normalizar_fechas_reddit para distintos volúmenes de posts
+    y lo compara con la implementación por fila hasta `max_por_fila` posts.
+
+    Args:
+        tamanos (tuple): Números de posts a medir
+        max_por_fila (int): Máximo de posts para medir la versión por fila
+
+    Returns:
+        pandas.DataFrame: Tabla con posts, segundos vectorizado, segundos por fila y posts/segundo
+    """
+    resultados = []
+    for n in tamanos:
+        df = generar_posts(n)
+        segundos = medir(normalizar_fechas_reddit, df.copy())
+        segundos_fila = medir(fechas_por_fila, df) if n <= max_por_fila else np.nan
+        resultados.append({
+            "posts": n,
+            "vectorizado_s": round(segundos, 3),
+            "por_fila_s": round(segundos_fila, 3),
+            "posts_por_s": int(n / segundos),
+        })
+        print(resultados[-1])
+    return pd.DataFrame(resultados)
+
+
+def benchmark_carga(tamanos=(10_000, 100_000, 500_000), columnas=("titulo", "id", "autor", "fecha_creacion", "fecha_crea", "hora_crea", "hora", "ciudad_o_pais", "magnitud", "tipo_magnitud", "latitud", "longitud")):
+    """
+    Compara la carga en frío del histórico como CSV completo (formato anterior)
+    y como la tabla de eventos en Parquet del almacén leyendo solo las
+    columnas del dashboard. El histórico se genera repitiendo las filas reales.
+
+    Args:
+        tamanos (tuple): Números de posts del histórico
+        columnas (tuple): Columnas que lee el dashboard
+
+    Returns:
+        pandas.DataFrame: Tabla con posts, segundos y MB en memoria de cada formato
+    """
+    historico = pd.read_csv(os.path.join(os.getcwd(), almacen.RUTA_SEMILLA))
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in tamanos:
+            df = historico.iloc[np.arange(n) % len(historico)].reset_index(drop=True)
+            ruta_csv = os.path.join(directorio, "historico.csv")
+            ruta_parquet = os.path.join(directorio, "historico.parquet")
+            df.to_csv(ruta_csv, index=False)
+            pq.write_table(almacen._tabla(almacen._preparar(df), almacen.ESQUEMA_EVENTOS), ruta_parquet, compression="zstd")
+
+            inicio = time.perf_counter()
+            df_csv = pd.read_csv(ruta_csv)
+            segundos_csv = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            df_parquet = pd.read_parquet(ruta_parquet, columns=list(columnas))
+            segundos_parquet = time.perf_counter() - inicio
+
+            resultados.append({
+                "posts": n,
+                "csv_s": round(segundos_csv, 3),
+                "parquet_s": round(segundos_parquet, 3),
+                "csv_mb": round(df_csv.memory_usage(deep=True).sum() / 1e6, 1),
+                "parquet_mb": round(df_parquet.memory_usage(deep=True).sum() / 1e6, 1),
+                "csv_disco_mb": round(os.path.getsize(ruta_csv) / 1e6, 1),
+                "parquet_disco_mb": round(os.path.getsize(ruta_parquet) / 1e6, 1),
+            })
+            print(resultados[-1])
+    return pd.DataFrame(resultados)
+
+
+def mapa_replicado(data, copias=2):
+    """
+    Implementación anterior del mapa global: la capa de terremotos con 2 * copias + 1
+    copias de cada fila desplazadas en 360° de longitud y sin vista repetida,
+    usada como referencia en el benchmark.
+
+    Args:
+        data (pandas.DataFrame): DataFrame con datos de terremotos
+        copias (int): Copias a cada lado del mundo original
+
+    Returns:
+        pdk.Deck: Mapa con los datos replicados
+    """
+    capa = graficos.capa_terremotos(data)
+    replicado = pd.concat([capa.assign(longitud=capa["longitud"] + offset * 360) for offset in range(-copias, copias + 1)], ignore_index=True)
+    layer = graficos.pdk.Layer("ScatterplotLayer", data=replicado, get_position=["longitud", "latitud"], get_radius="radius", get_fill_color="color", pickable=True, opacity=0.7)
+    return graficos.pdk.Deck(map_style=None, initial_view_state=graficos.pdk.ViewState(latitude=20, longitude=180, zoom=1, pitch=0), layers=[layer])
+
+
+def benchmark_mapa(tamanos=(1_000, 10_000, 100_000)):
+    """
+    Compara el JSON que recibe el navegador con el mapa de datos replicados en
+    longitud (formato anterior) y con la vista repetida de deck.gl
+    (graficos.mapa): bytes del payload y segundos de serialización.
+
+    Args:
+        tamanos (tuple): Números de eventos del mapa
+
+    Returns:
+        pandas.DataFrame: Tabla con eventos, MB y segundos de cada versión
+    """
+    historico = almacen.leer_historico(["autor", "fecha_crea", "ciudad_o_pais", "magnitud", "latitud", "longitud"])
+    historico = historico.dropna(subset=["latitud", "longitud", "magnitud"])
+    resultados = []
+    for n in tamanos:
+        df = historico.iloc[np.arange(n) % len(historico)].reset_index(drop=True)
+        inicio = time.perf_counter()
+        bytes_replicado = len(mapa_replicado(df).to_json().encode())
+        segundos_replicado = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        bytes_repetido = len(graficos.mapa(df).to_json().encode())
+        segundos_repetido = time.perf_counter() - inicio
+        resultados.append({
+            "eventos": n,
+            "replicado_mb": round(bytes_replicado / 1e6, 2),
+            "repetido_mb": round(bytes_repetido / 1e6, 2),
+            "replicado_s": round(segundos_replicado, 3),
+            "repetido_s": round(segundos_repetido, 3),
+        })
+        print(resultados[-1])
+    return pd.DataFrame(resultados)
+
+
+if __name__ == "__main__":
+    print(benchmark_fechas_reddit().to_string(index=False))
+    print(benchmark_carga().to_string(index=False))
+    print(benchmark_mapa().to_string(index=False))
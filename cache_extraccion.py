@@ -0,0 +1,153 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+RUTA_CACHE = os.path.join("data", "cache_extraccion.sqlite")
+
+contadores = {"aciertos": 0, "fallos": 0}  # Contadores de la sesión actual
+
+
+def conectar(ruta=None):
+    """
+    Abre la base SQLite del cache de extracciones y crea la tabla si no existe.
+
+    Args:
+        ruta (str): Ruta del archivo SQLite (por defecto data/cache_extraccion.sqlite)
+
+    Returns:
+        sqlite3.Connection: Conexión abierta a la base del cache
+    """
+    ruta = ruta or os.path.join(os.getcwd(), RUTA_CACHE)
+    conexion = sqlite3.connect(ruta)
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS extracciones ("
+        "clave TEXT PRIMARY KEY, "
+        "version TEXT NOT NULL, "
+        "id_post TEXT, "
+        "resultado TEXT NOT NULL, "
+        "creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_extracciones_version ON extracciones (version)")
+    return conexion
+
+
+def clave_cache(id_post, titulo, texto, version):
+    """
+    Calcula la clave de contenido de un post: hash SHA-256 del id, título,
+    texto y versión de prompt/modelo. Si cambia cualquiera de ellos el post
+    se vuelve a extraer.
+
+    Args:
+        id_post (str): ID del post en Reddit
+        titulo (str): Título del post
+        texto (str): Texto del post
+        version (str): Versión del prompt y modelo usados en la extracción
+
+    Returns:
+        str: Clave hexadecimal del post
+    """
+    contenido = "\x1f".join("" if valor is None else str(valor) for valor in (id_post, titulo, texto, version))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def leer_cache(claves, ruta=None):
+    """
+    Busca en el cache los resultados de un conjunto de claves y actualiza
+    los contadores de aciertos y fallos.
+
+    Args:
+        claves (list): Claves calculadas con clave_cache()
+        ruta (str): Ruta del archivo SQLite
+
+    Returns:
+        dict: {clave: [lugar, magnitud]} solo para los aciertos
+    """
+    claves = list(dict.fromkeys(claves))
+    encontrados = {}
+    with conectar(ruta) as conexion:
+        for inicio in range(0, len(claves), 500):  # Consultar por tramos para no exceder el límite de parámetros
+            tramo = claves[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(tramo))
+            filas = conexion.execute(
+                f"SELECT clave, resultado FROM extracciones WHERE clave IN ({marcadores})", tramo
+            ).fetchall()
+            for clave, resultado in filas:
+                encontrados[clave] = json.loads(resultado)
+    conexion.close()
+
+    contadores["aciertos"] += len(encontrados)
+    contadores["fallos"] += len(claves) - len(encontrados)
+    return encontrados
+
+
+def guardar_cache(registros, version, ruta=None):
+    """
+    Guarda en el cache los resultados de nuevas extracciones.
+
+    Args:
+        registros (list): Lista de tuplas (clave, id_post, resultado)
+        version (str): Versión del prompt y modelo usados
+        ruta (str): Ruta del archivo SQLite
+    """
+    if not registros:
+        return
+    with conectar(ruta) as conexion:
+        conexion.executemany(
+            "INSERT OR REPLACE INTO extracciones (clave, version, id_post, resultado) VALUES (?, ?, ?, ?)",
+            [(clave, version, None if id_post is None else str(id_post), json.dumps(resultado, ensure_ascii=False))
+             for clave, id_post, resultado in registros]
+        )
+    conexion.close()
+
+
+def eliminar_version(version, ruta=None):
+    """
+    Elimina del cache todas las extracciones hechas con una versión de
+    prompt/modelo, por ejemplo al cambiar de modelo.
+
+    Args:
+        version (str): Versión a eliminar
+        ruta (str): Ruta del archivo SQLite
+
+    Returns:
+        int: Número de registros eliminados
+    """
+    with conectar(ruta) as conexion:
+        eliminados = conexion.execute("DELETE FROM extracciones WHERE version = ?", (version,)).rowcount
+    conexion.close()
+    return eliminados
+
+
+def estadisticas_cache(ruta=None):
+    """
+    Resume el estado del cache: aciertos y fallos de la sesión y número de
+    registros guardados por versión.
+
+    Args:
+        ruta (str): Ruta del archivo SQLite
+
+    Returns:
+        dict: {"aciertos", "fallos", "tasa_aciertos", "por_version"}
+    """
+    with conectar(ruta) as conexion:
+        por_version = dict(conexion.execute(
+            "SELECT version, COUNT(*) FROM extracciones GROUP BY version"
+        ).fetchall())
+    conexion.close()
+
+    total = contadores["aciertos"] + contadores["fallos"]
+    return {
+        "aciertos": contadores["aciertos"],
+        "fallos": contadores["fallos"],
+        "tasa_aciertos": contadores["aciertos"] / total if total else 0.0,
+        "por_version": por_version,
+    }
+
+
+def reiniciar_contadores():
+    """
+    Pone a cero los contadores de aciertos y fallos de la sesión.
+    """
+    contadores["aciertos"] = 0
+    contadores["fallos"] = 0
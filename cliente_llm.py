@@ -0,0 +1,277 @@
+import time
+import random
+import asyncio
+
+CODIGOS_TRANSITORIOS = {429, 500, 502, 503, 504}
+ERRORES_CONEXION = {"ConnectError", "ConnectTimeout", "ReadError", "ReadTimeout", "WriteError", "WriteTimeout", "PoolTimeout", "RemoteProtocolError"}
+
+
+class RespuestaVacia(Exception):
+    """
+    Respuesta del modelo sin texto, por ejemplo cuando el candidato fue
+    bloqueado. Cuenta como una llamada fallida.
+    """
+
+
+def codigo_error(error):
+    """
+    Obtiene el código HTTP de un error de la API de Gemini, si lo tiene.
+    Las excepciones de google-genai (errors.APIError) y de google.api_core
+    exponen el código en el atributo `code`.
+
+    Args:
+        error (Exception): Error lanzado por la llamada al modelo
+
+    Returns:
+        int: Código HTTP o None si no se puede determinar
+    """
+    codigo = getattr(error, "code", None)
+    if isinstance(codigo, int):
+        return codigo
+    codigo = getattr(codigo, "value", None)  # Algunos clientes usan enums de gRPC/HTTP
+    if isinstance(codigo, int):
+        return codigo
+    nombre = type(error).__name__
+    if nombre in ("ResourceExhausted", "TooManyRequests"):
+        return 429
+    if nombre in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "BadGateway"):
+        return 503
+    return None
+
+
+def es_error_transitorio(error):
+    """
+    Indica si un error justifica reintentar la llamada (cuota agotada o error del servidor).
+
+    Args:
+        error (Exception): Error lanzado por la llamada al modelo
+
+    Returns:
+        bool: True si es un 429 o un 5xx
+    """
+    codigo = codigo_error(error)
+    if codigo is not None:
+        return codigo in CODIGOS_TRANSITORIOS or 500 <= codigo < 600
+    if type(error).__name__ in ERRORES_CONEXION:  # Errores de transporte de httpx, que usa google-genai
+        return True
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+class LimitadorTokens:
+    """
+    Limitador de tipo token bucket configurado en llamadas por minuto. Cada
+    llamada consume un token; los tokens se recargan a ritmo constante hasta
+    `rafaga`.
+    """
+
+    def __init__(self, por_minuto, rafaga=1):
+        self.tasa = por_minuto / 60.0
+        self.capacidad = max(1, rafaga)
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self._lock = None
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+
+    async def adquirir(self):
+        """
+        Espera hasta que haya un token disponible y lo consume.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:  # Un solo consumidor a la vez mantiene el orden de llegada
+            while True:
+                self._recargar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+
+
+class PoolClaves:
+    """
+    Conjunto de API keys de Gemini usadas en round-robin. Cada clave tiene su
+    propio modelo, su limitador de llamadas por minuto, un contador diario
+    opcional y un tiempo de enfriamiento tras recibir un 429; las claves en
+    enfriamiento o sin cuota diaria se saltan hasta que vuelvan a estar libres.
+    """
+
+    def __init__(self, claves, crear_modelo, por_minuto=15, por_dia=None, enfriamiento=60.0, rafaga=1):
+        if not claves:
+            raise ValueError("Se necesita al menos una API key de Gemini.")
+        self.crear_modelo = crear_modelo
+        self.por_dia = por_dia
+        self.enfriamiento = enfriamiento
+        self.siguiente = 0
+        self.entradas = [
+            {
+                "clave": clave,
+                "modelo": None,
+                "limitador": LimitadorTokens(por_minuto, rafaga),
+                "enfriado_hasta": 0.0,
+                "dia": None,
+                "llamadas_dia": 0,
+                "llamadas": 0,
+                "exitos": 0,
+                "errores_429": 0,
+                "errores": 0,
+            }
+            for clave in claves
+        ]
+
+    def _sin_cuota_diaria(self, entrada):
+        hoy = time.strftime("%Y-%m-%d", time.gmtime())
+        if entrada["dia"] != hoy:  # La cuota diaria de Gemini se renueva cada día
+            entrada["dia"] = hoy
+            entrada["llamadas_dia"] = 0
+        return self.por_dia is not None and entrada["llamadas_dia"] >= self.por_dia
+
+    async def obtener(self):
+        """
+        Elige la siguiente clave disponible en round-robin y espera su token.
+
+        Returns:
+            dict: Entrada de la clave elegida (con su modelo ya creado)
+
+        Raises:
+            RuntimeError: Si todas las claves agotaron su cuota diaria
+        """
+        while True:
+            ahora = time.monotonic()
+            total = len(self.entradas)
+            activas = [entrada for entrada in self.entradas if not self._sin_cuota_diaria(entrada)]
+            if not activas:
+                raise RuntimeError("Todas las API keys de Gemini agotaron su cuota diaria.")
+
+            for paso in range(total):
+                entrada = self.entradas[(self.siguiente + paso) % total]
+                if entrada in activas and entrada["enfriado_hasta"] <= ahora:
+                    self.siguiente = (self.siguiente + paso + 1) % total
+                    entrada["llamadas"] += 1
+                    entrada["llamadas_dia"] += 1
+                    if entrada["modelo"] is None:
+                        entrada["modelo"] = self.crear_modelo(entrada["clave"])
+                    await entrada["limitador"].adquirir()
+                    return entrada
+
+            await asyncio.sleep(min(entrada["enfriado_hasta"] for entrada in activas) - ahora)  # Todas en enfriamiento
+
+    def registrar(self, entrada, error=None):
+        """
+        Actualiza los contadores de una clave tras una llamada y la pone en
+        enfriamiento si la API respondió con un 429.
+
+        Args:
+            entrada (dict): Entrada devuelta por obtener()
+            error (Exception): Error de la llamada, o None si tuvo éxito
+        """
+        if error is None:
+            entrada["exitos"] += 1
+        elif codigo_error(error) == 429:
+            entrada["errores_429"] += 1
+            entrada["enfriado_hasta"] = time.monotonic() + self.enfriamiento
+        else:
+            entrada["errores"] += 1
+
+    def uso(self):
+        """
+        Devuelve los contadores de uso por clave, con la clave enmascarada.
+
+        Returns:
+            list: Lista de diccionarios con clave, llamadas, exitos, errores_429,
+                  errores, llamadas_dia y segundos de enfriamiento restantes
+        """
+        ahora = time.monotonic()
+        return [
+            {
+                "clave": f"...{entrada['clave'][-4:]}",
+                "llamadas": entrada["llamadas"],
+                "exitos": entrada["exitos"],
+                "errores_429": entrada["errores_429"],
+                "errores": entrada["errores"],
+                "llamadas_dia": entrada["llamadas_dia"],
+                "enfriamiento": max(0.0, entrada["enfriado_hasta"] - ahora),
+            }
+            for entrada in self.entradas
+        ]
+
+
+class ClienteLLM:
+    """
+    Cliente asíncrono para el modelo de Gemini: reparte las llamadas entre las
+    claves de un PoolClaves (cada una con su límite de llamadas por minuto),
+    acota las llamadas simultáneas y reintenta los 429/5xx con espera
+    exponencial y jitter. Las respuestas se devuelven asociadas a su clave,
+    en el mismo orden en que se enviaron.
+    """
+
+    def __init__(self, pool, concurrencia=4, reintentos=5, espera_base=2.0, espera_maxima=60.0):
+        self.pool = pool
+        self.concurrencia = max(1, concurrencia)
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.estadisticas = {"llamadas": 0, "reintentos": 0, "errores": 0}
+
+    async def _llamar(self, model, prompt):
+        if hasattr(model, "generate_content_async"):
+            return await model.generate_content_async(prompt)
+        return await asyncio.to_thread(model.generate_content, prompt)
+
+    async def generar(self, prompt, semaforo):
+        """
+        Envía un prompt con la siguiente clave disponible y reintenta los errores transitorios.
+
+        Args:
+            prompt (str): Prompt a enviar
+            semaforo (asyncio.Semaphore): Semáforo que acota las llamadas simultáneas
+
+        Returns:
+            str: Texto de la respuesta del modelo
+
+        Raises:
+            Exception: El último error si se agotan los reintentos o no es transitorio
+                       (RespuestaVacia si la respuesta no trae texto)
+        """
+        for intento in range(self.reintentos + 1):
+            async with semaforo:
+                entrada = await self.pool.obtener()
+                try:
+                    self.estadisticas["llamadas"] += 1
+                    respuesta = await self._llamar(entrada["modelo"], prompt)
+                    if respuesta.text is None:  # google-genai deja text en None si el candidato fue bloqueado o vino vacío
+                        raise RespuestaVacia("La respuesta del modelo no tiene texto")
+                    self.pool.registrar(entrada)
+                    return respuesta.text
+                except Exception as e:
+                    self.pool.registrar(entrada, e)  # Un 429 deja la clave en enfriamiento
+                    if not es_error_transitorio(e) or intento == self.reintentos:
+                        self.estadisticas["errores"] += 1
+                        raise
+                    error = e
+
+            espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))  # Backoff exponencial con jitter completo
+            self.estadisticas["reintentos"] += 1
+            print(f"Error transitorio ({error}), reintento {intento + 1} en {espera:.1f} s")
+            await asyncio.sleep(espera)
+
+    async def generar_todos(self, prompts):
+        """
+        Envía todos los prompts de forma concurrente y reúne las respuestas.
+
+        Args:
+            prompts (dict): {clave: prompt}
+
+        Returns:
+            dict: {clave: texto de respuesta o Exception si la llamada falló}, en el orden de entrada
+        """
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        claves = list(prompts.keys())
+        respuestas = await asyncio.gather(
+            *(self.generar(prompts[clave], semaforo) for clave in claves),
+            return_exceptions=True
+        )
+        return dict(zip(claves, respuestas))
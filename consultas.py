@@ -0,0 +1,502 @@
+import json
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from functools import reduce
+from collections import OrderedDict, namedtuple
+
+import almacen
+import volcanes
+
+AUTOR_OFICIAL = almacen.AUTOR_OFICIAL
+CONDICION_VALIDOS = almacen.CONDICION_VALIDOS  # Mismas condiciones de validez que paginas.utils.load_data
+
+
+# Estado de los filtros del dashboard ya normalizado: es la clave de los caches de MotorFiltros
+Filtros = namedtuple("Filtros", ["fechas", "magnitudes", "ubicaciones", "solo_oficiales", "distancia_volcan", "cerca", "region"],
+                     defaults=(None, None, None))
+
+
+def normalizar_filtros(date_range=(), mag_range=None, locations=(), solo_oficiales=False, dominio=None, cercania=None, region=None):
+    """
+    Convierte los valores del sidebar del dashboard en un Filtros canónico, para
+    que estados equivalentes compartan la misma clave de cache: las fechas y
+    magnitudes se recortan al dominio de los datos y se descartan si lo cubren
+    completo, y las ubicaciones se ordenan sin repetir.
+
+    Args:
+        date_range (tuple): Fechas (inicio, fin) inclusivas; se ignora si no tiene dos fechas
+        mag_range (tuple): Magnitudes (mínima, máxima) inclusivas, o None
+        locations (list): Ubicaciones (ciudad_o_pais) a incluir; vacía para todas
+        solo_oficiales (bool): Si True, solo posts de BrainstormBot
+        dominio (dict): Dominio de los datos (ver dominio_filtros), o None
+        cercania (tuple): (km,) para eventos a menos de km de cualquier volcán,
+                          (latitud, longitud, km) para eventos a menos de km de
+                          un punto, o None
+        region (tuple): Región del mapa: (lat_min, lat_max, lon_min, lon_max)
+                        para un rectángulo (lon_min > lon_max si cruza el
+                        antimeridiano), una lista de vértices [(lat, lon), ...]
+                        para un polígono (sin cruzar el antimeridiano), o None
+
+    Returns:
+        Filtros: fechas ("AAAA-MM-DD", "AAAA-MM-DD") o None, magnitudes
+                 (mínima, máxima) o None, ubicaciones (tuple), solo_oficiales,
+                 distancia_volcan (km) o None, cerca (latitud, longitud, km) o
+                 None y region ("rectangulo", ...) / ("poligono", vértices) o None
+    """
+    dominio = dominio or {}
+    fechas = None
+    if date_range is not None and len(date_range) == 2:
+        inicio, fin = date_range
+        if dominio.get("fecha_min") is not None:  # Fuera del dominio no hay datos: recortar
+            inicio, fin = max(inicio, dominio["fecha_min"]), min(fin, dominio["fecha_max"])
+        if (inicio, fin) != (dominio.get("fecha_min"), dominio.get("fecha_max")):
+            fechas = (inicio.isoformat(), fin.isoformat())
+
+    magnitudes = None
+    if mag_range is not None:
+        minima, maxima = round(float(mag_range[0]), 2), round(float(mag_range[1]), 2)
+        cubre = dominio.get("mag_min") is not None and minima <= dominio["mag_min"] and maxima >= dominio["mag_max"]
+        if not cubre:
+            magnitudes = (minima, maxima)
+
+    distancia_volcan = cerca = None
+    if cercania is not None and len(cercania) == 1:
+        distancia_volcan = round(float(cercania[0]), 1)
+    elif cercania is not None:
+        cerca = (round(float(cercania[0]), 4), round(float(cercania[1]), 4), round(float(cercania[2]), 1))
+
+    if region is not None and len(region) == 4 and not isinstance(region[0], (tuple, list)):
+        lat_min, lat_max, lon_min, lon_max = (round(float(valor), 4) for valor in region)
+        region = ("rectangulo", min(lat_min, lat_max), max(lat_min, lat_max), lon_min, lon_max)
+    elif region is not None and len(region) >= 3:
+        region = ("poligono", tuple((round(float(lat), 4), round(float(lon), 4)) for lat, lon in region))
+    else:
+        region = None
+
+    return Filtros(fechas, magnitudes, tuple(sorted(set(locations or ()))), bool(solo_oficiales), distancia_volcan, cerca, region)
+
+
+def condiciones_filtro(filtros):
+    """
+    Traduce cada dimensión activa de un Filtros a una condición SQL sobre la
+    tabla eventos, que SQLite resuelve con el índice de esa columna.
+
+    Args:
+        filtros (Filtros): Filtros normalizados
+
+    Returns:
+        dict: {dimension: (condicion, parametros)} solo con las dimensiones activas
+    """
+    condiciones = {}
+    if filtros.fechas is not None:  # fecha_crea se guarda como "YYYY-MM-DD", comparable como texto
+        fin = datetime.date.fromisoformat(filtros.fechas[1]) + datetime.timedelta(days=1)
+        condiciones["fechas"] = ("fecha_crea >= ? AND fecha_crea < ?", [filtros.fechas[0], fin.isoformat()])
+    if filtros.magnitudes is not None:
+        condiciones["magnitudes"] = ("magnitud BETWEEN ? AND ?", list(filtros.magnitudes))
+    if filtros.ubicaciones:
+        condiciones["ubicaciones"] = (f"ciudad_o_pais IN ({','.join('?' * len(filtros.ubicaciones))})", list(filtros.ubicaciones))
+    if filtros.solo_oficiales:
+        condiciones["solo_oficiales"] = ("autor = ?", [AUTOR_OFICIAL])
+    if filtros.distancia_volcan is not None:
+        condiciones["distancia_volcan"] = (  # Sin INDEXED BY, SQLite prefiere recorrer la tabla para un rango abierto
+            "rowid IN (SELECT rowid FROM eventos INDEXED BY eventos_distancia_volcan WHERE distancia_volcan <= ?)",
+            [filtros.distancia_volcan],
+        )
+    if filtros.cerca is not None:
+        condiciones["cerca"] = condicion_radio(*filtros.cerca)
+    if filtros.region is not None:
+        condiciones["region"] = condicion_region(filtros.region)
+    return condiciones
+
+
+def usa_cubo(filtros):
+    """
+    Indica si los filtros se pueden responder con el cubo de conteos, que no
+    tiene dimensiones espaciales (cercanía a volcanes y región del mapa).
+
+    Args:
+        filtros (Filtros): Filtros normalizados
+
+    Returns:
+        bool: True si ningún filtro espacial está activo
+    """
+    return filtros.distancia_volcan is None and filtros.cerca is None and filtros.region is None
+
+
+def _candidatos_celdas(lat_min, lat_max, lon_min, lon_max):
+    """
+    Condición SQL de los eventos de las celdas de la grilla que cubren un
+    rectángulo, leídos con el índice de la columna celda. Sin INDEXED BY,
+    SQLite prefiere recorrer toda la tabla para varios rangos unidos con OR.
+    """
+    rangos = almacen.rangos_celdas(lat_min, lat_max, lon_min, lon_max)
+    candidatos = " UNION ALL ".join(["SELECT rowid FROM eventos INDEXED BY eventos_celda WHERE celda BETWEEN ? AND ?"] * len(rangos))
+    return f"rowid IN ({candidatos})", [valor for rango in rangos for valor in rango]
+
+
+def condicion_region(region):
+    """
+    Construye la condición SQL de los eventos dentro de una región del mapa.
+    Con el índice de la columna celda solo se leen las celdas que cubren la
+    región (ver almacen.rangos_celdas) y en ellas se compara la posición exacta.
+
+    Args:
+        region (tuple): ("rectangulo", lat_min, lat_max, lon_min, lon_max) o
+                        ("poligono", ((lat, lon), ...)), como en Filtros.region
+
+    Returns:
+        tuple: (condicion, parametros)
+    """
+    if region[0] == "rectangulo":
+        _, lat_min, lat_max, lon_min, lon_max = region
+        candidatos, parametros = _candidatos_celdas(lat_min, lat_max, lon_min, lon_max)
+        union = "AND" if lon_min <= lon_max else "OR"  # lon_min > lon_max: el rectángulo cruza el antimeridiano
+        condicion = f"{candidatos} AND latitud BETWEEN ? AND ? AND (longitud >= ? {union} longitud <= ?)"
+        return condicion, parametros + [lat_min, lat_max, lon_min, lon_max]
+
+    vertices = region[1]
+    latitudes, longitudes = [lat for lat, _ in vertices], [lon for _, lon in vertices]
+    candidatos, parametros = _candidatos_celdas(min(latitudes), max(latitudes), min(longitudes), max(longitudes))
+    return f"{candidatos} AND en_poligono(latitud, longitud, ?)", parametros + [json.dumps([list(vertice) for vertice in vertices])]
+
+
+def condicion_radio(latitud, longitud, km):
+    """
+    Construye la condición SQL de los eventos a menos de km kilómetros de un
+    punto. Con el índice de la columna celda solo se leen las celdas de la
+    grilla que cubren el rectángulo del círculo, y en ellas se compara la
+    distancia exacta (ver almacen.rangos_celdas).
+
+    Args:
+        latitud (float): Latitud del punto en grados
+        longitud (float): Longitud del punto en grados
+        km (float): Radio en kilómetros
+
+    Returns:
+        tuple: (condicion, parametros)
+    """
+    delta_lat = np.degrees(km / volcanes.RADIO_TIERRA_KM)
+    lat_min, lat_max = max(latitud - delta_lat, -90.0), min(latitud + delta_lat, 90.0)
+    coseno = np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+    if lat_min == -90 or lat_max == 90 or delta_lat / coseno >= 180:  # El círculo toca un polo: todas las longitudes
+        lon_min, lon_max = -180.0, 180.0
+    else:
+        delta_lon = delta_lat / coseno
+        lon_min, lon_max = (longitud - delta_lon + 180) % 360 - 180, (longitud + delta_lon + 180) % 360 - 180
+    candidatos, parametros = _candidatos_celdas(lat_min, lat_max, lon_min, lon_max)
+    return f"{candidatos} AND distancia_km(latitud, longitud, ?, ?) <= ?", parametros + [latitud, longitud, km]
+
+
+def cubo_de_eventos(df):
+    """
+    Agrupa eventos en celdas con las mismas columnas que consultar_cubo, para
+    los filtros que el cubo no tiene (cercanía a volcanes).
+
+    Args:
+        df (pandas.DataFrame): Eventos con month, weekday, hour, magnitud y ciudad_o_pais
+
+    Returns:
+        pandas.DataFrame: Celdas con columnas month, weekday, hour, magnitud,
+                          ciudad_o_pais y conteo
+    """
+    columnas = ["month", "weekday", "hour", "magnitud", "ciudad_o_pais"]
+    return df.groupby(columnas, dropna=False).size().reset_index(name="conteo")
+
+
+def construir_filtro(filtros):
+    """
+    Traduce unos Filtros a una única condición SQL sobre la tabla eventos,
+    para que SQLite use sus índices y devuelva solo las filas que coinciden.
+
+    Args:
+        filtros (Filtros): Filtros normalizados (ver normalizar_filtros)
+
+    Returns:
+        tuple: (condicion, parametros) para usar en un WHERE
+    """
+    condiciones = [CONDICION_VALIDOS]
+    parametros = []
+    for condicion, valores in condiciones_filtro(filtros).values():
+        condiciones.append(condicion)
+        parametros += valores
+    return " AND ".join(condiciones), parametros
+
+
+class MotorFiltros:
+    """
+    Resuelve los filtros del dashboard sobre la tabla eventos con caches LRU
+    acotados. Cada dimensión activa (fechas, magnitudes, ubicaciones, solo
+    oficiales) se resuelve por separado con su índice de SQLite y su conjunto
+    de rowids se guarda, así al cambiar un solo filtro se reutilizan los de
+    las demás dimensiones. El resultado de cada combinación (rowids ordenados)
+    también se guarda, con Filtros normalizados como clave. Los caches se
+    vacían solos cuando la tabla eventos recibe filas nuevas.
+    """
+
+    def __init__(self, max_resultados=64, max_dimensiones=128):
+        self.max_resultados = max_resultados
+        self.max_dimensiones = max_dimensiones
+        self.resultados = OrderedDict()
+        self.dimensiones = OrderedDict()
+        self.agregados = OrderedDict()
+        self.version = None
+        self.estadisticas = {"aciertos": 0, "fallos": 0, "aciertos_dimension": 0, "fallos_dimension": 0}
+        self._lock = threading.Lock()
+
+    def _rowids(self, conexion, condicion, parametros):
+        filas = conexion.execute(f"SELECT rowid FROM eventos WHERE {CONDICION_VALIDOS} AND {condicion} ORDER BY rowid", parametros)
+        return np.fromiter((fila[0] for fila in filas), dtype=np.int64)
+
+    def _guardar(self, cache, clave, valor, maximo):
+        cache[clave] = valor
+        cache.move_to_end(clave)
+        while len(cache) > maximo:  # Descartar lo usado hace más tiempo
+            cache.popitem(last=False)
+
+    def _validar_version(self, conexion):
+        version = conexion.execute("SELECT MAX(rowid) FROM eventos").fetchone()[0]  # La tabla solo recibe inserciones
+        if version != self.version:
+            self.resultados.clear()
+            self.dimensiones.clear()
+            self.agregados.clear()
+            self.version = version
+
+    def ids(self, filtros):
+        """
+        Obtiene los rowids de la tabla eventos que cumplen los filtros.
+
+        Args:
+            filtros (Filtros): Filtros normalizados (ver normalizar_filtros)
+
+        Returns:
+            numpy.ndarray: Rowids ordenados de los eventos que coinciden
+        """
+        with self._lock:
+            conexion = almacen.conectar()
+            try:
+                self._validar_version(conexion)
+                if filtros in self.resultados:
+                    self.estadisticas["aciertos"] += 1
+                    self.resultados.move_to_end(filtros)
+                    return self.resultados[filtros]
+                self.estadisticas["fallos"] += 1
+
+                conjuntos = []
+                condiciones = condiciones_filtro(filtros) or {"todos": ("1", [])}
+                for dimension, (condicion, parametros) in condiciones.items():
+                    clave = (dimension, getattr(filtros, dimension, None))
+                    if clave in self.dimensiones:
+                        self.estadisticas["aciertos_dimension"] += 1
+                        self.dimensiones.move_to_end(clave)
+                    else:
+                        self.estadisticas["fallos_dimension"] += 1
+                        self._guardar(self.dimensiones, clave, self._rowids(conexion, condicion, parametros), self.max_dimensiones)
+                    conjuntos.append(self.dimensiones[clave])
+
+                ids = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), sorted(conjuntos, key=len))
+                self._guardar(self.resultados, filtros, ids, self.max_resultados)
+                return ids
+            finally:
+                conexion.close()
+
+    def eventos(self, filtros):
+        """
+        Obtiene los eventos que cumplen los filtros (ver consultar_eventos).
+
+        Args:
+            filtros (Filtros): Filtros normalizados
+
+        Returns:
+            pandas.DataFrame: Eventos que coinciden, del más reciente al más antiguo
+        """
+        ids = self.ids(filtros)
+        return consultar_eventos("rowid IN (SELECT value FROM json_each(?))", [json.dumps(ids.tolist())])
+
+    def celdas(self, filtros, nivel):
+        """
+        Agrupa los eventos que cumplen los filtros en las celdas de un nivel de
+        la grilla espacial del almacén (ver almacen.celda_espacial). El
+        resultado de cada combinación de filtros y nivel se guarda hasta que la
+        tabla eventos recibe filas nuevas.
+
+        Args:
+            filtros (Filtros): Filtros normalizados
+            nivel (int): Nivel de la grilla (1 a almacen.NIVEL_CELDA); cada nivel divide las celdas en 4
+
+        Returns:
+            pandas.DataFrame: Una fila por celda con celda, latitud y longitud del
+                              centro, conteo, magnitud_max y magnitud_promedio
+        """
+        ids = self.ids(filtros)
+        clave = (filtros, nivel)
+        with self._lock:
+            if clave in self.agregados:
+                self.agregados.move_to_end(clave)
+                return self.agregados[clave]
+
+        conexion = almacen.conectar()
+        df = pd.read_sql_query(
+            """SELECT celda >> ? AS celda, COUNT(*) AS conteo, MAX(magnitud) AS magnitud_max, AVG(magnitud) AS magnitud_promedio
+               FROM eventos WHERE rowid IN (SELECT value FROM json_each(?)) AND celda IS NOT NULL GROUP BY 1""",
+            conexion, params=[2 * (almacen.NIVEL_CELDA - nivel), json.dumps(ids.tolist())]
+        )
+        conexion.close()
+        df["latitud"], df["longitud"] = centro_celda(df["celda"].to_numpy(), nivel)
+        with self._lock:
+            self._guardar(self.agregados, clave, df, self.max_resultados)
+        return df
+
+
+def _compactar_bits(valores):
+    """
+    Inversa de almacen._intercalar_bits: toma los bits pares de cada entero.
+    """
+    valores = valores.astype(np.uint64) & 0x55555555
+    valores = (valores | (valores >> 1)) & 0x33333333
+    valores = (valores | (valores >> 2)) & 0x0F0F0F0F
+    valores = (valores | (valores >> 4)) & 0x00FF00FF
+    valores = (valores | (valores >> 8)) & 0x0000FFFF
+    return valores
+
+
+def centro_celda(celdas, nivel):
+    """
+    Calcula las coordenadas del centro de celdas de la grilla espacial.
+
+    Args:
+        celdas (numpy.ndarray): Celdas de un nivel (ver MotorFiltros.celdas)
+        nivel (int): Nivel de las celdas
+
+    Returns:
+        tuple: (latitudes, longitudes) del centro de cada celda, en grados
+    """
+    fila = _compactar_bits(celdas >> 1).astype(np.float64)
+    columna = _compactar_bits(celdas).astype(np.float64)
+    lado = 1 << nivel
+    return (fila + 0.5) / lado * 180 - 90, (columna + 0.5) / lado * 360 - 180
+
+
+def agregar_tiempo_evento(df):
+    """
+    Agrega al DataFrame el momento del evento ya interpretado, para que las
+    páginas y gráficos no vuelvan a parsear fechas ni horas en cada rerun:
+    event_ts (fecha_crea + hora_crea, tz-aware en UTC) y las columnas enteras
+    hour (0-23), weekday (0 = lunes) y month (año y mes como AAAAMM).
+    Si hora_crea no es válida, event_ts queda a las 00:00 de fecha_crea y
+    hour queda nulo.
+
+    Args:
+        df (pandas.DataFrame): DataFrame con columnas fecha_crea y hora_crea
+
+    Returns:
+        pandas.DataFrame: El mismo DataFrame con las columnas agregadas
+    """
+    fecha = pd.to_datetime(df["fecha_crea"], errors="coerce", utc=True).dt.normalize()
+    hora = pd.to_timedelta(df["hora_crea"].astype("string").str.strip(), errors="coerce")
+    df["event_ts"] = fecha + hora.fillna(pd.Timedelta(0))
+    df["hour"] = df["event_ts"].dt.hour.where(hora.notna()).astype("Int8")  # Sin hora válida no se asigna hora del día
+    df["weekday"] = df["event_ts"].dt.weekday.astype("Int8")
+    df["month"] = (df["event_ts"].dt.year * 100 + df["event_ts"].dt.month).astype("Int32")
+    return df
+
+
+def consultar_eventos(condicion=CONDICION_VALIDOS, parametros=(), columnas=None):
+    """
+    Obtiene de la tabla eventos solo las filas que cumplen la condición, con
+    los mismos tipos y columnas de tiempo que entrega paginas.utils.load_data.
+
+    Args:
+        condicion (str): Condición SQL, por ejemplo la de construir_filtro
+        parametros (list): Parámetros de la condición
+        columnas (list): Columnas a devolver; None para todas las de consulta
+
+    Returns:
+        pandas.DataFrame: Eventos que coinciden, del más reciente al más antiguo
+    """
+    columnas = columnas or ["id", *almacen.COLUMNAS_CONSULTA, "distancia_volcan"]
+    conexion = almacen.conectar()
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(columnas)} FROM eventos WHERE {condicion} ORDER BY fecha_creacion DESC",
+        conexion, params=list(parametros)
+    )
+    conexion.close()
+    if "fecha_creacion" in df.columns:
+        df["fecha_creacion"] = pd.to_datetime(df["fecha_creacion"], errors="coerce")
+    if "fecha_crea" in df.columns and "hora_crea" in df.columns:
+        df = agregar_tiempo_evento(df)
+    if "fecha_crea" in df.columns:
+        df["fecha_crea"] = pd.to_datetime(df["fecha_crea"], errors="coerce", utc=True)
+    return df
+
+
+def consultar_cubo(filtros):
+    """
+    Obtiene del cubo de conteos del almacén la porción que cumple los filtros,
+    ya agrupada por fecha, hora, magnitud, fuente y ubicación. Sirve para las
+    métricas y gráficos del dashboard sin leer los eventos uno por uno.
+
+    Args:
+        filtros (Filtros): Filtros normalizados (ver normalizar_filtros)
+
+    Returns:
+        pandas.DataFrame: Celdas del cubo con columnas month, weekday, hour,
+                          magnitud, ciudad_o_pais y conteo
+    """
+    condiciones, parametros = ["1"], []
+    if filtros.fechas is not None:  # Igual que en condiciones_filtro, la fecha se compara como texto
+        condiciones.append("c.fecha BETWEEN ? AND ?")
+        parametros += list(filtros.fechas)
+    if filtros.magnitudes is not None:  # El cubo guarda la magnitud en centésimas, la precisión del slider
+        condiciones.append("c.magnitud_centesimas BETWEEN ROUND(? * 100) AND ROUND(? * 100)")
+        parametros += list(filtros.magnitudes)
+    if filtros.ubicaciones:
+        condiciones.append(f"u.nombre IN ({','.join('?' * len(filtros.ubicaciones))})")
+        parametros += list(filtros.ubicaciones)
+    if filtros.solo_oficiales:
+        condiciones.append("c.oficial = 1")
+
+    conexion = almacen.conectar()
+    df = pd.read_sql_query(
+        f"""SELECT c.mes AS month, c.dia_semana AS weekday, c.hora AS hour, c.magnitud_centesimas AS magnitud,
+                   u.nombre AS ciudad_o_pais, c.conteo AS conteo
+            FROM cubo c JOIN ubicaciones u ON u.id = c.ubicacion_id
+            WHERE {' AND '.join(condiciones)}""",
+        conexion, params=parametros
+    )
+    conexion.close()
+    df["magnitud"] = df["magnitud"] / 100
+    df["month"] = df["month"].astype("Int32").replace(0, pd.NA)  # Los valores faltantes se guardan como 0 / -1 / ''
+    df["weekday"] = df["weekday"].astype("Int8").replace(-1, pd.NA)
+    df["hour"] = df["hour"].astype("Int8").replace(-1, pd.NA)
+    df["ciudad_o_pais"] = df["ciudad_o_pais"].replace("", None)
+    return df
+
+
+def dominio_filtros():
+    """
+    Calcula con agregados SQL los valores que necesita el sidebar del
+    dashboard, sin cargar los eventos: rango de fechas, rango de magnitudes y
+    ubicaciones disponibles.
+
+    Returns:
+        dict: total, fecha_min, fecha_max (datetime.date o None), mag_min,
+              mag_max (float o None) y ubicaciones (lista ordenada)
+    """
+    conexion = almacen.conectar()
+    total, fecha_min, fecha_max, mag_min, mag_max = conexion.execute(
+        f"SELECT COUNT(*), MIN(fecha_crea), MAX(fecha_crea), MIN(magnitud), MAX(magnitud) FROM eventos WHERE {CONDICION_VALIDOS}"
+    ).fetchone()
+    ubicaciones = [fila[0] for fila in conexion.execute(
+        f"SELECT DISTINCT ciudad_o_pais FROM eventos WHERE {CONDICION_VALIDOS} AND ciudad_o_pais IS NOT NULL ORDER BY ciudad_o_pais"
+    )]
+    conexion.close()
+    return {
+        "total": total,
+        "fecha_min": datetime.date.fromisoformat(fecha_min) if fecha_min else None,
+        "fecha_max": datetime.date.fromisoformat(fecha_max) if fecha_max else None,
+        "mag_min": mag_min,
+        "mag_max": mag_max,
+        "ubicaciones": ubicaciones,
+    }
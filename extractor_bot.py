@@ -0,0 +1,57 @@
+import pandas as pd
+
+# Título: "🌎 Andreanof Islands, Aleutian Is.: Earthquake - Землетрясение (5.5 Mgqm, at 14:21 UTC)"
+# o con magnitud estimada: "🗾 Ryukyu Islands, Japan: 地震 - Earthquake (M5+ estimated, at 05:59 UTC)"
+PATRON_TITULO = (
+    r'^\S+\s+(?P<lugar>[^:]+?):\s[^()]*\('
+    r'(?:(?P<magnitud>\d+(?:\.\d+)?)\s+(?P<tipo_magnitud>M\w*)'
+    r'|M(?P<magnitud_estimada>\d+(?:\.\d+)?)[+~-]?\s+estimated)'
+    r',\s+at\s+(?P<hora_utc>\d{2}:\d{2})\s+UTC\)\s*$'
+)
+
+# Cuerpo: "... 2025-07-16 14:21:52 UTC (gibbous moon), on land, *Andreanof Islands, Aleutian Is.* (52.12, -173.37) ..."
+PATRON_COORDENADAS = r'\*(?P<lugar_texto>[^*\n]+)\*\s*\((?P<latitud>-?\d{1,2}(?:\.\d+)?),\s*(?P<longitud>-?\d{1,3}(?:\.\d+)?)\)'
+
+
+def extraer_posts_bot(df):
+    """
+    Extrae lugar, magnitud, tipo de magnitud, hora y coordenadas de los posts
+    que siguen la plantilla de BrainstormBot, de forma vectorizada y sin usar
+    el modelo de IA. El lugar y la magnitud salen del título y las coordenadas
+    del primer reporte del texto.
+
+    Args:
+        df (pandas.DataFrame): DataFrame con columnas 'titulo' y 'texto_post'
+
+    Returns:
+        pandas.DataFrame: DataFrame con el mismo índice y columnas ciudad_o_pais,
+                         magnitud, tipo_magnitud, hora_utc, latitud, longitud y
+                         parseado (True si el post se extrajo completo)
+    """
+    titulos = df["titulo"].fillna("").astype(str)
+    textos = df["texto_post"].fillna("").astype(str)
+
+    titulo = titulos.str.extract(PATRON_TITULO)
+    coordenadas = textos.str.extract(PATRON_COORDENADAS)
+
+    magnitud = pd.to_numeric(titulo["magnitud"], errors="coerce")
+    magnitud_estimada = pd.to_numeric(titulo["magnitud_estimada"], errors="coerce")
+    latitud = pd.to_numeric(coordenadas["latitud"], errors="coerce")
+    longitud = pd.to_numeric(coordenadas["longitud"], errors="coerce")
+
+    resultado = pd.DataFrame(index=df.index)
+    resultado["ciudad_o_pais"] = titulo["lugar"].str.strip()
+    resultado["magnitud"] = magnitud.fillna(magnitud_estimada)
+    resultado["tipo_magnitud"] = titulo["tipo_magnitud"].where(magnitud.notna(), "M (estimada)")
+    resultado["hora_utc"] = titulo["hora_utc"]
+    resultado["latitud"] = latitud
+    resultado["longitud"] = longitud
+
+    resultado["parseado"] = (  # Solo se aceptan posts con todos los campos y coordenadas válidas
+        resultado["ciudad_o_pais"].notna()
+        & resultado["magnitud"].notna()
+        & latitud.between(-90, 90)
+        & longitud.between(-180, 180)
+    )
+    resultado.loc[~resultado["parseado"], "tipo_magnitud"] = None
+    return resultado
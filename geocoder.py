@@ -0,0 +1,245 @@
+import os
+import difflib
+import unicodedata
+import pandas as pd
+
+import extractor_bot
+
+RUTA_GAZETTEER = os.path.join("data", "gazetteer.csv")
+RUTA_APRENDIDOS = os.path.join("data", "lugares_aprendidos.csv")  # Generado al actualizar; no se versiona
+PRIORIDAD_FUENTES = {"manual": 0, "historico": 1, "volcanes": 2, "historico_partes": 3, "aprendido": 4}  # Menor valor = fuente preferida
+CORTE_DIFUSO = 0.9  # Similitud mínima para aceptar una coincidencia aproximada
+
+_indice = {}  # Cache del gazetteer cargado: {(ruta, ruta_aprendidos): (mtimes, {nombre_normalizado: (latitud, longitud)}, nombres)}
+
+
+def normalizar_nombre(nombres):
+    """
+    Normaliza nombres de lugares para compararlos: minúsculas, sin tildes,
+    sin signos de puntuación y con espacios simples.
+
+    Args:
+        nombres (pandas.Series): Nombres de lugares
+
+    Returns:
+        pandas.Series: Nombres normalizados ("" si el valor es nulo)
+    """
+    nombres = nombres.fillna("").astype(str)
+    nombres = nombres.map(lambda nombre: unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii"))
+    return (
+        nombres.str.lower()
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def _leer_aprendidos(ruta_aprendidos):
+    """
+    Lee las observaciones de lugares aprendidos y las resume en un lugar por
+    nombre normalizado, con la mediana de todas sus coordenadas reportadas.
+    """
+    if not os.path.exists(ruta_aprendidos):
+        return pd.DataFrame(columns=["nombre", "latitud", "longitud", "fuente"])
+
+    observaciones = pd.read_csv(ruta_aprendidos)
+    observaciones["clave"] = normalizar_nombre(observaciones["nombre"])
+    aprendidos = observaciones.groupby("clave").agg(nombre=("nombre", "first"), latitud=("latitud", "median"), longitud=("longitud", "median"))
+    aprendidos["fuente"] = "aprendido"
+    return aprendidos.reset_index(drop=True)
+
+
+def cargar_gazetteer(ruta=None, ruta_aprendidos=None, aprendidos=True):
+    """
+    Carga el gazetteer incluido en data/gazetteer.csv junto con los lugares
+    aprendidos en las actualizaciones (data/lugares_aprendidos.csv) y construye
+    el índice por nombre normalizado. Los lugares aprendidos tienen la menor
+    prioridad: solo se usan para nombres que el gazetteer no conoce. El índice
+    se guarda en memoria y solo se recarga si alguno de los archivos cambia.
+
+    Args:
+        ruta (str): Ruta del gazetteer (por defecto data/gazetteer.csv)
+        ruta_aprendidos (str): Ruta de los lugares aprendidos (por defecto data/lugares_aprendidos.csv)
+        aprendidos (bool): Si False, solo se carga el gazetteer incluido
+
+    Returns:
+        tuple: (indice, nombres) con indice = {nombre_normalizado: (latitud, longitud)}
+               y nombres = lista de nombres normalizados para la búsqueda aproximada
+    """
+    ruta = ruta or os.path.join(os.getcwd(), RUTA_GAZETTEER)
+    ruta_aprendidos = (ruta_aprendidos or os.path.join(os.getcwd(), RUTA_APRENDIDOS)) if aprendidos else None
+    if not os.path.exists(ruta) and not (aprendidos and os.path.exists(ruta_aprendidos)):
+        return {}, []
+
+    mtimes = tuple(os.path.getmtime(archivo) if archivo and os.path.exists(archivo) else None for archivo in (ruta, ruta_aprendidos))
+    clave_cache = (ruta, ruta_aprendidos)
+    if clave_cache in _indice and _indice[clave_cache][0] == mtimes:
+        return _indice[clave_cache][1], _indice[clave_cache][2]
+
+    base = pd.read_csv(ruta) if os.path.exists(ruta) else pd.DataFrame(columns=["nombre", "latitud", "longitud", "fuente"])
+    gazetteer = pd.concat([base, _leer_aprendidos(ruta_aprendidos)], ignore_index=True) if aprendidos else base
+    gazetteer["clave"] = normalizar_nombre(gazetteer["nombre"])
+    gazetteer["prioridad"] = gazetteer["fuente"].map(PRIORIDAD_FUENTES).fillna(len(PRIORIDAD_FUENTES))
+    gazetteer = (
+        gazetteer[gazetteer["clave"] != ""]
+        .sort_values("prioridad", kind="stable")
+        .drop_duplicates(subset=["clave"], keep="first")
+    )
+    indice = dict(zip(gazetteer["clave"], zip(gazetteer["latitud"], gazetteer["longitud"])))
+    nombres = list(indice.keys())
+    _indice[clave_cache] = (mtimes, indice, nombres)
+    return indice, nombres
+
+
+def _resolver(clave, partes, indice, nombres):
+    """
+    Busca un lugar en el índice: primero el nombre completo, luego cada parte
+    separada por comas (de la más específica a la más general) y por último una
+    coincidencia aproximada del nombre completo con difflib.
+    """
+    if clave in indice:
+        return indice[clave], "exacto"
+
+    for parte in partes:
+        if parte in indice:
+            return indice[parte], "parcial"
+
+    cercanos = difflib.get_close_matches(clave, nombres, n=1, cutoff=CORTE_DIFUSO)
+    if cercanos:
+        return indice[cercanos[0]], "aproximado"
+    return (None, None), None
+
+
+def geocodificar(lugares, ruta=None):
+    """
+    Convierte nombres de lugares (ciudad_o_pais) en coordenadas usando el
+    gazetteer local, sin llamadas a APIs. Cada nombre distinto se resuelve una
+    sola vez y el resultado se reparte a todas sus filas.
+
+    Args:
+        lugares (pandas.Series): Nombres de lugares a geocodificar
+        ruta (str): Ruta del gazetteer
+
+    Returns:
+        pandas.DataFrame: DataFrame con el mismo índice y columnas latitud, longitud
+                         (NaN si no se encontró) y metodo_geo
+    """
+    indice, nombres = cargar_gazetteer(ruta)
+
+    lugares_texto = lugares.fillna("").astype(str).str.strip()
+    unicos = pd.Series(lugares_texto.unique())
+    resueltos = {}
+    for lugar, clave in zip(unicos, normalizar_nombre(unicos)):
+        if not clave:
+            resueltos[lugar] = ((None, None), None)
+            continue
+        partes = [parte for parte in normalizar_nombre(pd.Series(lugar.split(","))) if parte]
+        resueltos[lugar] = _resolver(clave, partes, indice, nombres)
+
+    resultado = pd.DataFrame(index=lugares.index)
+    resultado["latitud"] = pd.to_numeric(lugares_texto.map(lambda lugar: resueltos[lugar][0][0]), errors="coerce")
+    resultado["longitud"] = pd.to_numeric(lugares_texto.map(lambda lugar: resueltos[lugar][0][1]), errors="coerce")
+    resultado["metodo_geo"] = lugares_texto.map(lambda lugar: resueltos[lugar][1])
+    return resultado
+
+
+def aprender_lugares(ids, lugares, latitudes, longitudes, ruta_aprendidos=None):
+    """
+    Guarda en data/lugares_aprendidos.csv las coordenadas que BrainstormBot
+    reporta para lugares que el gazetteer incluido no conoce, para que las
+    siguientes actualizaciones los resuelvan sin IA. Son epicentros, no la
+    ubicación del lugar: se guarda una observación por post y cargar_gazetteer
+    usa la mediana de todas, así el lugar no queda fijo en el primer sismo.
+    data/gazetteer.csv no se modifica.
+
+    Args:
+        ids (pandas.Series): Ids de Reddit de los posts, para no repetir observaciones
+        lugares (pandas.Series): Nombres de lugares
+        latitudes (pandas.Series): Latitudes reportadas
+        longitudes (pandas.Series): Longitudes reportadas
+        ruta_aprendidos (str): Ruta de los lugares aprendidos
+
+    Returns:
+        int: Número de observaciones agregadas
+    """
+    ruta_aprendidos = ruta_aprendidos or os.path.join(os.getcwd(), RUTA_APRENDIDOS)
+    indice, _ = cargar_gazetteer(aprendidos=False)  # Solo el gazetteer incluido: los aprendidos siguen sumando observaciones
+
+    nuevos = pd.DataFrame({"id": ids.values, "nombre": lugares.values, "latitud": latitudes.values, "longitud": longitudes.values})
+    nuevos["clave"] = normalizar_nombre(nuevos["nombre"])
+    nuevos = nuevos[(nuevos["clave"] != "") & ~nuevos["clave"].isin(indice.keys())].dropna(subset=["latitud", "longitud"])
+    if os.path.exists(ruta_aprendidos):
+        nuevos = nuevos[~nuevos["id"].isin(pd.read_csv(ruta_aprendidos, usecols=["id"])["id"])]
+    if nuevos.empty:
+        return 0
+
+    nuevos[["id", "nombre", "latitud", "longitud"]].round({"latitud": 4, "longitud": 4}).to_csv(
+        ruta_aprendidos, mode="a", header=not os.path.exists(ruta_aprendidos), index=False
+    )
+    return len(nuevos)
+
+
+def construir_gazetteer(ruta_historico=None, ruta_volcanes=None, ruta=None):
+    """
+    Regenera data/gazetteer.csv a partir de los lugares ingresados a mano
+    (fuente "manual"), los lugares y coordenadas que BrainstormBot reporta en el
+    histórico y los nombres del archivo de volcanes.
+
+    Args:
+        ruta_historico (str): CSV histórico (por defecto data/Earthquakes_posts_new.csv)
+        ruta_volcanes (str): CSV de volcanes (por defecto data/volcanoes_selected_columns.csv)
+        ruta (str): Ruta del gazetteer a escribir
+
+    Returns:
+        pandas.DataFrame: Gazetteer generado
+    """
+    ruta = ruta or os.path.join(os.getcwd(), RUTA_GAZETTEER)
+    ruta_historico = ruta_historico or os.path.join(os.getcwd(), "data", "Earthquakes_posts_new.csv")
+    ruta_volcanes = ruta_volcanes or os.path.join(os.getcwd(), "data", "volcanoes_selected_columns.csv")
+    partes = []
+
+    if os.path.exists(ruta):  # Conservar las entradas ingresadas a mano
+        existente = pd.read_csv(ruta)
+        partes.append(existente[existente["fuente"] == "manual"])
+
+    if os.path.exists(ruta_historico):
+        historico = pd.read_csv(ruta_historico)
+        bot = extractor_bot.extraer_posts_bot(historico)
+        bot = bot[bot["parseado"]]
+        lugares_texto = historico.loc[bot.index, "texto_post"].fillna("").str.extract(extractor_bot.PATRON_COORDENADAS)["lugar_texto"]
+        for nombres in (bot["ciudad_o_pais"], lugares_texto):  # Lugar del título y lugar del reporte
+            lugares = pd.DataFrame({
+                "nombre": nombres.values,
+                "latitud": bot["latitud"].values,
+                "longitud": bot["longitud"].values,
+                "fuente": "historico",
+            })
+            partes.append(lugares)
+            lugares_partes = lugares.assign(nombre=lugares["nombre"].str.split(",")).explode("nombre")  # "Tari, Hela, Papua New Guinea" -> "Tari", "Hela", ...
+            partes.append(lugares_partes.assign(nombre=lugares_partes["nombre"].str.strip(), fuente="historico_partes"))
+
+    if os.path.exists(ruta_volcanes):
+        volcanes = pd.read_csv(ruta_volcanes).dropna(subset=["Latitude", "Longitude", "ciudad_o_pais"])
+        partes.append(pd.DataFrame({
+            "nombre": volcanes["ciudad_o_pais"].values,
+            "latitud": volcanes["Latitude"].values,
+            "longitud": volcanes["Longitude"].values,
+            "fuente": "volcanes",
+        }))
+
+    gazetteer = pd.concat(partes, ignore_index=True)
+    gazetteer["clave"] = normalizar_nombre(gazetteer["nombre"])
+    gazetteer["prioridad"] = gazetteer["fuente"].map(PRIORIDAD_FUENTES)
+    gazetteer = gazetteer[gazetteer["clave"] != ""]
+    gazetteer = (
+        gazetteer.groupby(["prioridad", "clave"], sort=True)
+        .agg(nombre=("nombre", "first"), latitud=("latitud", "median"), longitud=("longitud", "median"), fuente=("fuente", "first"))
+        .reset_index()
+        .drop_duplicates(subset=["clave"], keep="first")
+        .sort_values(["prioridad", "nombre"])
+    )
+    gazetteer = gazetteer[["nombre", "latitud", "longitud", "fuente"]].round({"latitud": 4, "longitud": 4})
+    gazetteer.to_csv(ruta, index=False)
+    for clave_cache in [clave for clave in _indice if clave[0] == ruta]:  # Descartar los índices de este gazetteer
+        _indice.pop(clave_cache, None)
+    print(f"Gazetteer generado - {len(gazetteer)} lugares")
+    return gazetteer
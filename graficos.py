@@ -1,9 +1,16 @@
 import os
+import hashlib
+import threading
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import pydeck as pdk
+from collections import OrderedDict
+
+import volcanes
 
 
 from graficos import *
@@ -11,6 +18,280 @@ from scraping import *
 from procesado import *
 
 
+def huella_datos(data):
+    """
+    Calcula una huella del contenido de un DataFrame (valores y columnas, sin
+    el índice) con el hash vectorizado de pandas. Dos subconjuntos filtrados
+    con las mismas filas tienen la misma huella.
+    
+    Args:
+        data (pandas.DataFrame): Datos a identificar
+        
+    Returns:
+        str: Huella hexadecimal
+    """
+    huella = hashlib.sha1(",".join(map(str, data.columns)).encode())
+    huella.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return huella.hexdigest()
+
+
+class CacheFiguras:
+    """
+    Cache LRU de figuras de Plotly y mapas de PyDeck, compartido por todas las
+    sesiones del proceso. La clave es el gráfico, la huella de los datos y las
+    opciones, así una vista idéntica no repite ni el trabajo de pandas ni la
+    construcción de la figura. Las figuras guardadas no deben modificarse.
+    """
+
+    def __init__(self, max_entradas=64, max_artefactos=16):
+        self.max_entradas = max_entradas
+        self.max_artefactos = max_artefactos
+        self.figuras = OrderedDict()
+        self.claves = {}  # id(figura) -> clave, para reconocer las figuras guardadas
+        self.artefactos = OrderedDict()
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, constructor, data, huella=None, **opciones):
+        """
+        Devuelve la figura guardada para estos datos y opciones, o la construye
+        con constructor(data, **opciones) y la guarda. Con mostrar_volcanes la clave incluye
+        la versión del archivo de volcanes, así un cambio en el archivo
+        reconstruye el mapa.
+        
+        Args:
+            constructor (callable): Función de graficos que construye la figura
+            data (pandas.DataFrame): Datos filtrados
+            huella (str): Huella de data ya calculada (ver huella_datos), o None
+            **opciones: Opciones del gráfico
+            
+        Returns:
+            Figura de Plotly, pdk.Deck o None, igual que el constructor
+        """
+        clave = (constructor.__name__, huella or huella_datos(data), tuple(sorted(opciones.items())))
+        if opciones.get("mostrar_volcanes"):  # Los mapas con volcanes dependen también del archivo de volcanes
+            datos_volcanes = volcanes.cargar_volcanes()
+            clave += (datos_volcanes.mtime if datos_volcanes is not None else None,)
+        contador = self.contadores.setdefault(constructor.__name__, {"aciertos": 0, "fallos": 0})
+        with self._lock:
+            if clave in self.figuras:
+                contador["aciertos"] += 1
+                self.figuras.move_to_end(clave)
+                return self.figuras[clave]
+
+        figura = constructor(data, **opciones)  # Construir fuera del lock para no bloquear otras sesiones
+        with self._lock:
+            contador["fallos"] += 1
+            self.figuras[clave] = figura
+            self.claves[id(figura)] = clave
+            while len(self.figuras) > self.max_entradas:  # Descartar la figura usada hace más tiempo
+                _, descartada = self.figuras.popitem(last=False)
+                self.claves.pop(id(descartada), None)
+        return figura
+
+    def artefacto(self, figura, formato):
+        """
+        Devuelve el archivo de descarga de una figura en el formato pedido,
+        serializándolo solo la primera vez. Los artefactos de las figuras
+        guardadas se reutilizan mientras la figura siga en el cache.
+        
+        Args:
+            figura: Figura de Plotly o pdk.Deck
+            formato (str): 'html' o 'json'
+            
+        Returns:
+            bytes: Contenido del archivo
+        """
+        with self._lock:
+            clave = self.claves.get(id(figura))
+            if clave is not None and self.figuras.get(clave) is not figura:  # id reutilizado por otro objeto
+                clave = None
+            if (clave, formato) in self.artefactos:
+                self.artefactos.move_to_end((clave, formato))
+                return self.artefactos[(clave, formato)]
+
+        contenido = serializar_figura(figura, formato)
+        if clave is not None:
+            with self._lock:
+                self.artefactos[(clave, formato)] = contenido
+                while len(self.artefactos) > self.max_artefactos:  # Los HTML de mapas pesan varios MB
+                    self.artefactos.popitem(last=False)
+        return contenido
+
+    def estadisticas(self):
+        """
+        Devuelve los aciertos, fallos y tasa de aciertos por gráfico.
+        
+        Returns:
+            pandas.DataFrame: Una fila por gráfico con aciertos, fallos y tasa_aciertos
+        """
+        tabla = pd.DataFrame.from_dict(self.contadores, orient="index", columns=["aciertos", "fallos"]).rename_axis("grafico")
+        tabla["tasa_aciertos"] = (tabla["aciertos"] / (tabla["aciertos"] + tabla["fallos"])).round(3)
+        return tabla.reset_index()
+
+
+CACHE_FIGURAS = CacheFiguras()
+
+
+def serializar_figura(figura, formato):
+    """
+    Convierte una figura en el contenido de su archivo de descarga.
+    
+    Args:
+        figura: Figura de Plotly o pdk.Deck
+        formato (str): 'html' (Plotly con plotly.js desde CDN, o mapa de PyDeck) o 'json'
+        
+    Returns:
+        bytes: Contenido del archivo
+    """
+    if isinstance(figura, pdk.Deck):
+        return figura.to_html(as_string=True).encode()
+    if formato == "json":
+        return figura.to_json().encode()
+    return pio.to_html(figura, include_plotlyjs="cdn").encode()
+
+
+def artefacto_descarga(figura, formato):
+    """
+    Obtiene el archivo de descarga de una figura pasando por CACHE_FIGURAS.
+    Pensada para st.download_button(data=...), que la llama solo al descargar.
+    
+    Args:
+        figura: Figura de Plotly o pdk.Deck
+        formato (str): 'html' o 'json'
+        
+    Returns:
+        bytes: Contenido del archivo
+    """
+    return CACHE_FIGURAS.artefacto(figura, formato)
+
+
+def figura_cacheada(constructor, data, huella=None, **opciones):
+    """
+    Construye una figura de graficos pasando por el cache compartido CACHE_FIGURAS.
+    
+    Args:
+        constructor (callable): mapa, distr, torta, map_m, map_s o map_h
+        data (pandas.DataFrame): Datos filtrados
+        huella (str): Huella de data ya calculada, para no repetir el hash en cada gráfico
+        **opciones: Opciones del gráfico (por ejemplo solo_oficiales en mapa)
+        
+    Returns:
+        Figura de Plotly, pdk.Deck o None
+    """
+    return CACHE_FIGURAS.obtener(constructor, data, huella, **opciones)
+
+
+def conteos(data, columna):
+    """
+    Cuenta los eventos por valor de una columna, tanto en eventos individuales
+    como en celdas del cubo de conteos (ver consultas.consultar_cubo), donde
+    cada fila pesa su columna 'conteo'.
+    
+    Args:
+        data (pandas.DataFrame): Eventos o celdas del cubo
+        columna (str): Columna por la que contar
+        
+    Returns:
+        pandas.Series: Cantidad de eventos por valor, de mayor a menor
+    """
+    if "conteo" not in data.columns:
+        return data[columna].value_counts()
+    return data.groupby(columna)["conteo"].sum().sort_values(ascending=False, kind="stable")
+
+
+# Vista con el mundo repetido por deck.gl al desplazarse en longitud, sin duplicar filas en los datos
+VISTA_MUNDO = pdk.View(type="MapView", controller=True, repeat=True)
+ZOOM_MAPA = 1  # Zoom inicial de los mapas
+_capa_volcanes = {}  # Capa de volcanes ya construida y mtime del archivo del que salió
+
+# Sobre UMBRAL_PUNTOS eventos el mapa agrega los eventos en celdas de la grilla espacial del almacén
+UMBRAL_PUNTOS = 20_000
+NIVELES_MAPA = (4, 6, 8, 10, 12)
+
+ANCHO_BIN_MAGNITUD = 0.1  # Bins del histograma de magnitudes
+
+COLOR_OFICIAL = np.array([255, 0, 0, 180], dtype=np.uint8)
+COLOR_NO_OFICIAL = np.array([0, 255, 0, 180], dtype=np.uint8)
+
+
+def capa_terremotos(data, solo_oficiales=False):
+    """
+    Prepara los datos de la capa de terremotos del mapa con solo las columnas
+    que usa PyDeck (posición, radio, color y campos del tooltip), para que el
+    JSON que recibe el navegador no arrastre el resto de las columnas. Las
+    coordenadas se redondean a 4 decimales (~10 m), el radio a metros enteros
+    y el color se calcula de forma vectorizada a partir de autor.
+    
+    Args:
+        data (pandas.DataFrame): DataFrame con datos de terremotos
+        solo_oficiales (bool): Si True, deja solo los eventos de BrainstormBot
+        
+    Returns:
+        pandas.DataFrame: Columnas longitud, latitud, radius, color, ciudad_o_pais y magnitud
+    """
+    validos = data[["latitud", "longitud", "magnitud", "autor"]].notna().all(axis=1)
+    validos &= pd.to_datetime(data["fecha_crea"], errors="coerce").notna()  # Igual que antes, solo eventos con fecha
+    if solo_oficiales:
+        validos &= data["autor"] == "BrainstormBot"
+    filas = data.loc[validos]
+
+    oficial = (filas["autor"] == "BrainstormBot").to_numpy()
+    magnitud = filas["magnitud"].to_numpy(dtype=np.float64)
+    return pd.DataFrame({
+        "longitud": filas["longitud"].to_numpy(dtype=np.float64).round(4),
+        "latitud": filas["latitud"].to_numpy(dtype=np.float64).round(4),
+        "radius": (magnitud ** 2 * 5000).round().astype(np.int32),  # Radio según magnitud
+        "color": np.where(oficial[:, None], COLOR_OFICIAL, COLOR_NO_OFICIAL).tolist(),
+        "ciudad_o_pais": filas["ciudad_o_pais"].to_numpy() if "ciudad_o_pais" in filas.columns else None,
+        "magnitud": magnitud.round(2),
+    })
+
+
+def conteo_por_entero(data, columna, largo):
+    """
+    Cuenta los eventos por valor de una columna entera de 0 a largo - 1 (hora,
+    día de la semana) con np.bincount, pesando cada fila por su 'conteo' si son
+    celdas del cubo. Los valores nulos no se cuentan.
+    
+    Args:
+        data (pandas.DataFrame): Eventos o celdas del cubo
+        columna (str): Columna entera a contar
+        largo (int): Cantidad de valores posibles
+        
+    Returns:
+        numpy.ndarray: Cantidad de eventos por valor, de largo elementos
+    """
+    valores = data[columna].to_numpy(dtype=np.float64, na_value=np.nan)
+    validos = ~np.isnan(valores)
+    pesos = data["conteo"].to_numpy(dtype=np.float64)[validos] if "conteo" in data.columns else None
+    return np.bincount(valores[validos].astype(np.int64), weights=pesos, minlength=largo)[:largo].astype(np.int64)
+
+
+def histograma_magnitudes(data):
+    """
+    Agrupa las magnitudes en bins de ANCHO_BIN_MAGNITUD centrados en cada
+    décima (la precisión con que se reportan) con np.histogram, pesando cada
+    fila por su 'conteo' si son celdas del cubo.
+    
+    Args:
+        data (pandas.DataFrame): Eventos o celdas del cubo con columna 'magnitud'
+        
+    Returns:
+        tuple: (centros, cantidades) de los bins, como numpy.ndarray
+    """
+    magnitudes = data["magnitud"].to_numpy(dtype=np.float64, na_value=np.nan)
+    validas = ~np.isnan(magnitudes)
+    if not validas.any():
+        return np.array([]), np.array([], dtype=np.int64)
+    magnitudes = magnitudes[validas]
+    pesos = data["conteo"].to_numpy(dtype=np.float64)[validas] if "conteo" in data.columns else None
+    primera, ultima = np.round(magnitudes.min() / ANCHO_BIN_MAGNITUD), np.round(magnitudes.max() / ANCHO_BIN_MAGNITUD)
+    bordes = (np.arange(primera, ultima + 2) - 0.5) * ANCHO_BIN_MAGNITUD
+    cantidades, _ = np.histogram(magnitudes, bins=bordes, weights=pesos)
+    return np.round(bordes[:-1] + ANCHO_BIN_MAGNITUD / 2, 2), cantidades.astype(np.int64)
+
+
 def mapa(data, solo_oficiales=False, mostrar_volcanes=False):
     """
     Crea un mapa interactivo 3D global mostrando la distribución de terremotos y opcionalmente volcanes.
@@ -34,45 +315,9 @@ def mapa(data, solo_oficiales=False, mostrar_volcanes=False):
     layers = []
     
     if not data.empty:  # Procesar datos de terremotos
-        valid_data = data.dropna(subset=["latitud", "longitud", "magnitud", "autor"]).copy()
-
-        
-        valid_data['fecha_crea'] = pd.to_datetime(valid_data['fecha_crea'], errors='coerce')
-        valid_data = valid_data.dropna(subset=["fecha_crea"])
-        valid_data['fecha_crea'] = valid_data['fecha_crea'].dt.strftime('%Y-%m-%d %H:%M:%S')
-
-        if 'hora_crea' in valid_data.columns:  # Convertir 'hora_crea' a string si existe
-            valid_data['hora_crea'] = valid_data['hora_crea'].astype(str)
-
-        if solo_oficiales:  # Filtrar solo oficiales si el checkbox está activo
-            valid_data = valid_data[valid_data["autor"] == "BrainstormBot"]
-            if not valid_data.empty:
-                valid_data["color"] = [[255, 0, 0, 180]] * len(valid_data)
-        else:
-            def color_por_autor(autor):
-                if autor == "BrainstormBot":
-                    return [255, 0, 0, 180]
-                else:
-                    return [0, 255, 0, 180]
-
-            valid_data["color"] = valid_data["autor"].apply(color_por_autor)
-
-        valid_data["color"] = valid_data["color"].apply(lambda x: list(x) if not isinstance(x, list) else x)  # Asegurar que 'color' sea lista normal
-
-        valid_data["radius"] = valid_data["magnitud"] ** 2 * 5000  # Calcular radius basado en magnitud
-
-        copias = 2  # Repetición longitudinal para vista global
-        dfs = []
-        for offset in range(-copias, copias + 1):
-            df_copy = valid_data.copy()
-            df_copy["longitud"] = df_copy["longitud"] + (offset * 360)
-            dfs.append(df_copy)
-
-        final_data = pd.concat(dfs, ignore_index=True)
-
         earthquake_layer = pdk.Layer(  # Crear capa de terremotos
             "ScatterplotLayer",
-            data=final_data,
+            data=capa_terremotos(data, solo_oficiales),
             get_position=["longitud", "latitud"],
             get_radius="radius",
             get_fill_color="color",
@@ -83,52 +328,124 @@ def mapa(data, solo_oficiales=False, mostrar_volcanes=False):
         layers.append(earthquake_layer)
 
     if mostrar_volcanes:  # Procesar datos de volcanes si se solicita
-        volcanoes_path = os.path.join(os.getcwd(), "data", "volcanoes_selected_columns.csv")
-        if os.path.exists(volcanoes_path):
-            volcanoes_df = pd.read_csv(volcanoes_path)
-            volcanoes_df = volcanoes_df.dropna(subset=["Latitude", "Longitude"]).copy()
-            
-            if not volcanoes_df.empty:
-                volcanoes_df = volcanoes_df.rename(columns={
-                    "Latitude": "latitud", 
-                    "Longitude": "longitud",
-                    "Volcano Name": "nombre"
-                })
-                volcanoes_df["color"] = [[0, 0, 0, 20]] * len(volcanoes_df)
-                volcanoes_df["radius"] = 8000 * 22
-
-                copias = 2
-                volcano_dfs = []
-                for offset in range(-copias, copias + 1):
-                    df_copy = volcanoes_df.copy()
-                    df_copy["longitud"] = df_copy["longitud"] + (offset * 360)
-                    volcano_dfs.append(df_copy)
-                
-                final_volcanoes = pd.concat(volcano_dfs, ignore_index=True)
-                
-                volcano_layer = pdk.Layer(
-                    "ScatterplotLayer",
-                    data=final_volcanoes,
-                    get_position=["longitud", "latitud"],
-                    get_radius="radius",
-                    get_fill_color="color",
-                    pickable=True,
-                    opacity=0.8,
-                )
-                
-                layers.append(volcano_layer)
+        volcano_layer = capa_volcanes()
+        if volcano_layer is not None:
+            layers.append(volcano_layer)
+    
+    return deck_mundo(layers)
+
+
+def capa_volcanes():
+    """
+    Crea la capa de volcanes del mapa a partir de volcanes.cargar_volcanes.
+    La capa se guarda y se reutiliza en todos los mapas hasta que cambia el
+    archivo de volcanes.
+    
+    Returns:
+        pdk.Layer: Capa de volcanes o None si no hay archivo o coordenadas
+    """
+    datos = volcanes.cargar_volcanes()
+    if datos is None or len(datos.latitud) == 0:
+        return None
+    if _capa_volcanes.get("mtime") != datos.mtime:
+        _capa_volcanes["capa"] = pdk.Layer(
+            "ScatterplotLayer",
+            data=volcanes.tabla_volcanes(datos),
+            get_position=["longitud", "latitud"],
+            get_radius=8000 * 22,  # Radio y color constantes: no viajan por fila
+            get_fill_color=[0, 0, 0, 20],
+            pickable=True,
+            opacity=0.8,
+        )
+        _capa_volcanes["mtime"] = datos.mtime
+    return _capa_volcanes["capa"]
+
+
+def deck_mundo(layers):
+    """
+    Crea el mapa global de PyDeck con las capas dadas, la vista inicial y el
+    tooltip comunes a los mapas de la app.
     
+    Args:
+        layers (list): Capas de PyDeck
+        
+    Returns:
+        pdk.Deck: Objeto de mapa PyDeck o None si no hay capas
+    """
     if not layers:
         return None
         
-    view = pdk.ViewState(latitude=20, longitude=180, zoom=1, pitch=0)
+    view = pdk.ViewState(latitude=20, longitude=180, zoom=ZOOM_MAPA, pitch=0)
     
     tooltip = {
         "html": "<b>Lugar:</b> {ciudad_o_pais}<br><b>Magnitud:</b> {magnitud}<br>",
         "style": {"color": "white"}
     }
     
-    return pdk.Deck(map_style=None, initial_view_state=view, layers=layers, tooltip=tooltip)
+    return pdk.Deck(map_style=None, initial_view_state=view, views=[VISTA_MUNDO], layers=layers, tooltip=tooltip)
+
+
+def nivel_mapa(eventos, zoom=None):
+    """
+    Decide si el mapa muestra cada evento o celdas agregadas de la grilla
+    espacial, según la cantidad de eventos y el zoom: con más de
+    UMBRAL_PUNTOS eventos se agregan en celdas de unos 16 píxeles a ese zoom.
+    
+    Args:
+        eventos (int): Cantidad de eventos a mostrar
+        zoom (float): Zoom del mapa; None para el zoom inicial ZOOM_MAPA
+        
+    Returns:
+        int: Nivel de la grilla (ver consultas.MotorFiltros.celdas) o None para mostrar puntos
+    """
+    if eventos <= UMBRAL_PUNTOS:
+        return None
+    zoom = ZOOM_MAPA if zoom is None else zoom
+    return min(NIVELES_MAPA, key=lambda nivel: abs(nivel - (zoom + 5)))  # Celda de 360 / 2**(zoom + 5) grados ~ 16 px
+
+
+def mapa_agregado(celdas, nivel, mostrar_volcanes=False):
+    """
+    Crea el mapa global con los eventos agregados en celdas de la grilla
+    espacial: un círculo por celda, con tamaño según la cantidad de eventos y
+    color según la magnitud máxima (amarillo hasta 4, rojo desde 8).
+    
+    Args:
+        celdas (pandas.DataFrame): Celdas con latitud, longitud, conteo, magnitud_max
+                                   y magnitud_promedio (ver consultas.MotorFiltros.celdas)
+        nivel (int): Nivel de la grilla de las celdas
+        mostrar_volcanes (bool): Si True, incluye volcanes en el mapa
+        
+    Returns:
+        pdk.Deck: Objeto de mapa PyDeck o None si no hay datos
+    """
+    layers = []
+    if not celdas.empty:
+        conteo = celdas["conteo"].to_numpy(dtype=np.float64)
+        intensidad = np.clip((celdas["magnitud_max"].to_numpy(dtype=np.float64) - 4) / 4, 0, 1)[:, None]
+        medio_lado = 111_195 * 180 / 2 ** nivel / 2  # Media altura de la celda en metros
+        capa = pd.DataFrame({
+            "longitud": celdas["longitud"].round(4),
+            "latitud": celdas["latitud"].round(4),
+            "radius": (medio_lado * (0.35 + 0.65 * np.sqrt(conteo / conteo.max()))).round().astype(np.int32),
+            "color": ((1 - intensidad) * [255, 200, 0, 200] + intensidad * [200, 0, 0, 200]).round().astype(np.uint8).tolist(),
+            "ciudad_o_pais": [f"{int(n):,} eventos" for n in conteo],  # Mismo tooltip que los puntos
+            "magnitud": [f"máx. {maxima:.1f} · prom. {promedio:.1f}" for maxima, promedio in zip(celdas["magnitud_max"], celdas["magnitud_promedio"])],
+        })
+        layers.append(pdk.Layer(
+            "ScatterplotLayer",
+            data=capa,
+            get_position=["longitud", "latitud"],
+            get_radius="radius",
+            get_fill_color="color",
+            pickable=True,
+            opacity=0.7,
+        ))
+    if mostrar_volcanes:
+        volcano_layer = capa_volcanes()
+        if volcano_layer is not None:
+            layers.append(volcano_layer)
+    return deck_mundo(layers)
 
 
 def distr(df):
@@ -142,7 +459,7 @@ def distr(df):
     - Validar si los datos siguen patrones esperados según la ley de Gutenberg-Richter
     
     Args:
-        df (pandas.DataFrame): DataFrame con columna 'magnitud'
+        df (pandas.DataFrame): DataFrame con columna 'magnitud' (y 'conteo' si son celdas del cubo)
         
     Returns:
         plotly.graph_objects.Figure: Gráfico de histograma o None si no hay datos
@@ -150,8 +467,15 @@ def distr(df):
     if "magnitud" not in df.columns or df.empty:
         return None
 
-    fig = px.histogram(df, x="magnitud", nbins=50, 
-                      color_discrete_sequence=['#1e40af'])
+    centros, cantidades = histograma_magnitudes(df)
+    if len(centros) == 0:
+        return None
+
+    fig = go.Figure(go.Bar(  # Barras ya agrupadas: la figura no depende de la cantidad de eventos
+        x=centros, y=cantidades, width=ANCHO_BIN_MAGNITUD,
+        marker_color='#1e40af',
+        hovertemplate='<b>Magnitud:</b> %{x:.1f}<br><b>Conteo:</b> %{y}<extra></extra>'
+    ))
 
     fig.update_layout(
         showlegend=False,
@@ -189,7 +513,7 @@ def torta(df):
     - Proporcionar una vista resumen de la distribución geográfica
     
     Args:
-        df (pandas.DataFrame): DataFrame con columna 'ciudad_o_pais'
+        df (pandas.DataFrame): DataFrame con columna 'ciudad_o_pais' (o celdas del cubo)
         
     Returns:
         plotly.graph_objects.Figure: Gráfico de pastel o None si no hay datos
@@ -197,7 +521,7 @@ def torta(df):
     if "ciudad_o_pais" not in df.columns or df.empty:
         return None
 
-    top = df["ciudad_o_pais"].value_counts().head(5).reset_index()
+    top = conteos(df, "ciudad_o_pais").head(5).reset_index()
     top.columns = ["ciudad_o_pais", "Cantidad"]
 
     max_idx = top["Cantidad"].idxmax()
@@ -254,15 +578,13 @@ def map_m(data):
     - Correlacionar actividad sísmica con eventos específicos o ciclos naturales
     
     Args:
-        data (pandas.DataFrame): DataFrame con columna 'fecha_crea'
+        data (pandas.DataFrame): DataFrame con columna 'month' (AAAAMM, ver consultas.agregar_tiempo_evento) o celdas del cubo
         
     Returns:
         plotly.graph_objects.Figure: Gráfico de línea temporal o None si no hay datos
     """
-    data_copy = data.copy()
-    data_copy["month_year"] = data_copy["fecha_crea"].dt.to_period("M")  # fecha_crea ya es datetime, convertir a periodo mes
-    monthly_counts = data_copy.groupby("month_year").size().reset_index(name="count")
-    monthly_counts["month_year"] = monthly_counts["month_year"].astype(str)
+    monthly_counts = conteos(data, "month").sort_index().rename_axis("month_year").reset_index(name="count")
+    monthly_counts["month_year"] = monthly_counts["month_year"].map(lambda mes: f"{mes // 100}-{mes % 100:02d}")  # 202507 -> "2025-07"
 
     if monthly_counts.empty:
         return None
@@ -309,16 +631,14 @@ def map_s(data):
     - Visualizar de forma circular y clara la distribución temporal semanal
     
     Args:
-        data (pandas.DataFrame): DataFrame con columna 'fecha_crea'
+        data (pandas.DataFrame): DataFrame con columna 'weekday' (0 = lunes) o celdas del cubo
         
     Returns:
         plotly.graph_objects.Figure: Gráfico radar polar o None si no hay datos
     """
-    data_copy = data.copy()
-    data_copy["day_of_week"] = data_copy["fecha_crea"].dt.day_name()
-
     day_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    day_counts = data_copy["day_of_week"].value_counts().reindex(day_order, fill_value=0)
+    day_counts = pd.Series(conteo_por_entero(data, "weekday", 7))
+    day_counts.index = day_order
 
     fig = go.Figure()
     fig.add_trace(
@@ -376,25 +696,16 @@ def map_h(data):
     - Formato circular ideal para representar las 24 horas del día
     
     Args:
-        data (pandas.DataFrame): DataFrame con columna 'hora_crea'
+        data (pandas.DataFrame): DataFrame con columna 'hour' (0-23) o celdas del cubo; no se modifica
         
     Returns:
         plotly.graph_objects.Figure: Gráfico radar polar horario o None si no hay datos/error
     """
-    if "hora_crea" not in data.columns:
+    if "hour" not in data.columns:
         return None
 
-    data["hora_crea"] = data["hora_crea"].apply(lambda x: x.strip() if isinstance(x, str) else x)  # Limpiar espacios solo en strings para evitar error .str en no-string
-
-    data["hora_crea"] = pd.to_datetime(data["hora_crea"], format="%H:%M:%S", errors="coerce").dt.time  # Convertir a datetime.time, valores inválidos se vuelven NaT
-
     try:
-        data_copy = data.copy()
-        data_copy["hour"] = data_copy["hora_crea"].apply(lambda x: x.hour if pd.notna(x) else None)
-
-        hour_counts = data_copy["hour"].value_counts().sort_index()
-        all_hours = pd.Series(range(24))
-        hour_counts = hour_counts.reindex(all_hours, fill_value=0)
+        hour_counts = pd.Series(conteo_por_entero(data, "hour", 24))
 
         theta_all = [f"{h}:00" for h in hour_counts.index]  # Todas las horas para theta (puntos completos)
 
@@ -31,24 +31,28 @@ st.set_page_config(
 
 inject_css()  # Inyectar estilos CSS
 
-if "data" not in st.session_state:  # Cargar datos (usando cache)
-    st.session_state.data = load_data()
-
-df = st.session_state.data
+def datos_sesion():
+    """
+    Carga los datos (usando cache) la primera vez que una página los necesita.
+    El dashboard no los usa: consulta directamente los eventos filtrados.
+    """
+    if "data" not in st.session_state:
+        st.session_state.data = load_data()
+    return st.session_state.data
 
 pagina_actual = main_navigation()  # Navegación principal
 
 if pagina_actual == "📊 Dashboard":  # Mostrar contenido según página seleccionada
     clear_sidebar()
-    dashboard.show(df)
+    dashboard.show()
 
 elif pagina_actual == "🔍 Exploración":
     clear_sidebar()
-    paginas.exploracion.show(df)
+    paginas.exploracion.show(datos_sesion())
 
 elif pagina_actual == "📢 Presentación":
     clear_sidebar()
-    paginas.presentacion.show(df)
+    paginas.presentacion.show(datos_sesion())
 
 
 dashboard.show_footer()
@@ -7,18 +7,17 @@ from paginas.utils import *
 from scraping import *
 from procesado import *
 from paginas.styles import *
+import consultas
 
-def show(df):
+def show():
     """
     Función principal del dashboard que muestra la interfaz completa con métricas,
-    filtros y visualizaciones de datos sísmicos en tiempo real.
-    
-    Args:
-        df (pandas.DataFrame): DataFrame con datos de terremotos
+    filtros y visualizaciones de datos sísmicos en tiempo real. Las métricas y
+    los gráficos agregados se calculan con el cubo de conteos del almacén;
+    solo el mapa carga los eventos que cumplen los filtros, o sus celdas
+    agregadas cuando son muchos. Cada panel es un fragmento: sus propios
+    controles lo vuelven a ejecutar sin recalcular el resto de la página.
     """
-    inject_css()
-    hide_streamlit_header()
-
     col_logo, col_title, col_btn = st.columns([1, 4, 1])  # Header con logo, título y botón
     with col_logo:
         logo_path = os.path.join(os.getcwd(), "data", "logocolor.png")
@@ -34,126 +33,175 @@ def show(df):
             with st.spinner("Actualizando datos..."):
                 obtener_datos("Earthquakes", 10)  # cambiar a 15
                 df_actualizado = procesar_y_limpiar_datos() 
-                st.session_state.data =  load_data()
+                for cargar in (load_data, load_dominio, load_eventos_filtrados, load_cubo, load_celdas):  # El histórico cambió: descartar las versiones en cache
+                    cargar.clear()
+                st.session_state.pop("data", None)  # Las demás páginas recargan los datos al abrirse
                 st.session_state.data_loaded = True
                 st.balloons()
                 st.success("Datos actualizados correctamente 🎉")
                 st.rerun()
 
-    df = st.session_state.get("data", df)  # Usar datos actualizados o originales
-
-    if df.empty:
+    dominio = load_dominio()
+    if not dominio["total"]:
         st.warning("⚠️ No hay datos disponibles.")
         st.stop()
 
-    # Asegurar que fecha_crea esté en formato datetime
-    if "fecha_crea" in df.columns:
-        df["fecha_crea"] = pd.to_datetime(df["fecha_crea"], errors="coerce", utc=True)
-
-    if "hora_crea" in df.columns and df["hora_crea"].notna().any():  # Procesar 'hora_crea' solo si existe y tiene datos no nulos
-        df["hora_crea"] = df["hora_crea"].apply(lambda x: x.strip() if isinstance(x, str) else x)  # Limpiar espacios solo en strings
-        df["hora_crea"] = pd.to_datetime(df["hora_crea"], format="%H:%M:%S", errors="coerce").dt.time  # Convertir a datetime.time
-    else:
-        df["hora_crea"] = pd.NaT
+    date_range, mag_range, selected_locations, solo_oficiales, cercania, region = sidebar_dashboard(dominio)  # Sidebar filtros
 
-    def combinar_fecha_hora(row):  # Función para combinar fecha y hora en un solo timestamp
-        if pd.isna(row["fecha_crea"]):
-            return pd.NaT
-        if pd.isna(row["hora_crea"]):
-            return row["fecha_crea"]  # Retornar el timestamp completo
-        # Convertir fecha_crea a date para combine
-        fecha_date = row["fecha_crea"].date()
-        return pd.Timestamp.combine(fecha_date, row["hora_crea"]).tz_localize('UTC')
+    filtros = consultas.normalizar_filtros(date_range, mag_range, selected_locations, solo_oficiales, dominio, cercania, region)  # Clave canónica de los filtros
+    cubo = load_cubo(filtros)  # Conteos agregados para métricas y gráficos
+    huella = huella_datos(cubo)  # Identifica la porción del cubo en el cache de figuras
 
-    df["fecha_hora"] = df.apply(combinar_fecha_hora, axis=1)
+    fragmento_metricas(cubo)
 
-    date_range, mag_range, selected_locations, solo_oficiales, mostrar_volcanes = sidebar_dashboard(df)  # Sidebar filtros
-
-    filtered = df.copy()  # Aplicar filtros
-
-    if len(date_range) == 2:  # Filtrar por rango de fechas usando solo fecha_crea
-        # Convertir date objects a datetime con UTC para compatibilidad
-        start = pd.Timestamp(date_range[0], tz='UTC')
-        end = pd.Timestamp(date_range[1], tz='UTC') + pd.Timedelta(days=1)
-
-        filtered = filtered[(filtered["fecha_crea"] >= start) & (filtered["fecha_crea"] < end)]
-
-    filtered = filtered[(filtered["magnitud"] >= mag_range[0]) & (filtered["magnitud"] <= mag_range[1])]  # Filtrar por magnitud
+    map_col, dist_col = st.columns([2, 1])  # Gráficos
+    with map_col:
+        fragmento_mapa(filtros, int(cubo["conteo"].sum()))
+    with dist_col:
+        fragmento_distribucion(cubo, huella)
 
-    if selected_locations:  # Filtrar por ubicaciones
-        filtered = filtered[filtered["ciudad_o_pais"].isin(selected_locations)]
+    fragmento_tendencias(cubo, huella)
 
-    if solo_oficiales and "autor" in filtered.columns:  # Filtrar solo oficiales (BrainstormBot) si aplica
-        filtered = filtered[filtered["autor"] == "BrainstormBot"]
+    if st.query_params.get("debug"):  # Panel de depuración: abrir el dashboard con ?debug=1
+        mostrar_panel_depuracion()
 
+@st.fragment
+def fragmento_metricas(cubo):
+    """
+    Fragmento con la fila de métricas: total, magnitud promedio y máxima y
+    ubicación más activa, calculadas con el cubo de conteos.
+    
+    Args:
+        cubo (pandas.DataFrame): Celdas del cubo que cumplen los filtros
+    """
+    total = int(cubo["conteo"].sum())
     col1, col2, col3, col4 = st.columns(4)  # Métricas
     with col1:
-        st.markdown(f'<div class="metric-card"><div class="metric-label">Total Terremotos</div><div class="metric-value">{len(filtered):,}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-label">Total Terremotos</div><div class="metric-value">{total:,}</div></div>', unsafe_allow_html=True)
     with col2:
-        avg_mag = filtered['magnitud'].mean() if not filtered.empty else 0.0
+        avg_mag = (cubo["magnitud"] * cubo["conteo"]).sum() / total if total else 0.0
         st.markdown(f'<div class="metric-card"><div class="metric-label">Magnitud Promedio</div><div class="metric-value">{avg_mag:.1f}</div></div>', unsafe_allow_html=True)
     with col3:
-        max_mag = filtered['magnitud'].max() if not filtered.empty else 0.0
+        max_mag = cubo["magnitud"].max() if total else 0.0
         st.markdown(f'<div class="metric-card"><div class="metric-label">Magnitud Máxima</div><div class="metric-value">{max_mag:.1f}</div></div>', unsafe_allow_html=True)
     with col4:
-        top_location = filtered["ciudad_o_pais"].value_counts().index[0] if not filtered.empty and len(filtered["ciudad_o_pais"].value_counts()) > 0 else "N/A"
+        ubicaciones = conteos(cubo, "ciudad_o_pais")
+        top_location = ubicaciones.index[0] if len(ubicaciones) > 0 else "N/A"
         st.markdown(f'<div class="metric-card"><div class="metric-label">Ubicación Más Activa</div><div class="metric-value">{top_location}</div></div>', unsafe_allow_html=True)
 
-    map_col, dist_col = st.columns([2, 1])  # Gráficos
-    with map_col:
+@st.fragment
+def fragmento_mapa(filtros, total):
+    """
+    Fragmento con el mapa global y su interruptor de volcanes: mostrar u
+    ocultar los volcanes redibuja solo el mapa.
+    
+    Args:
+        filtros (consultas.Filtros): Filtros normalizados (ver consultas.normalizar_filtros)
+        total (int): Cantidad de eventos que cumplen los filtros
+    """
+    col_titulo, col_volcanes = st.columns([3, 1])
+    with col_volcanes:
+        mostrar_volcanes = st.toggle("🌋 Volcanes", value=False, key="dashboard_mostrar_volcanes")
+    with col_titulo:
         title = "🗺️ Mapa Global" + (" y Volcanes 🌋" if mostrar_volcanes else "")
         st.markdown(f'<div class="chart-container">{title}</div>', unsafe_allow_html=True)
-        filtered = filtered[filtered["magnitud"]< 15] 
-        map_chart = mapa(filtered, solo_oficiales=solo_oficiales, mostrar_volcanes=mostrar_volcanes)
-        if map_chart:
-            st.pydeck_chart(map_chart, use_container_width=True, height=827)
-            # El mapa solo tiene opción HTML
-            create_download_section(map_chart, "Mapa Global de Terremotos", "map")
-        else:
-            st.info("📍 Sin datos para mostrar en el mapa")
 
-    with dist_col:
-        st.markdown('<div class="chart-container">📊 Distribución de Magnitudes</div>', unsafe_allow_html=True)
-        mag_fig = distr(filtered)
-        if mag_fig:
-            st.plotly_chart(mag_fig, use_container_width=True, config={"displayModeBar": False})
-            # Ahora ofrece HTML y JSON
-            create_download_section(mag_fig, "Distribución de Magnitudes", "chart")
-        else:
-            st.info("Sin datos de magnitud")
-
-        st.markdown('<div class="chart-container">📍 Top 5 Ubicaciones</div>', unsafe_allow_html=True)
-        loc_fig = torta(filtered)
-        if loc_fig:
-            st.plotly_chart(loc_fig, use_container_width=True, config={"displayModeBar": False})
-            # Ahora ofrece HTML y JSON
-            create_download_section(loc_fig, "Top 5 Ubicaciones", "chart")
-        else:
-            st.info("Sin datos de ubicación")
+    nivel = nivel_mapa(total)  # Con muchos eventos el mapa muestra celdas agregadas en vez de puntos
+    if nivel is None:
+        filtered = load_eventos_filtrados(filtros)  # El mapa necesita cada evento; ya trae event_ts, hour, weekday y month
+        map_chart = figura_cacheada(mapa, filtered, huella_datos(filtered), solo_oficiales=filtros.solo_oficiales, mostrar_volcanes=mostrar_volcanes)
+    else:
+        celdas = load_celdas(filtros, nivel)
+        map_chart = figura_cacheada(mapa_agregado, celdas, huella_datos(celdas), nivel=nivel, mostrar_volcanes=mostrar_volcanes)
+    if map_chart:
+        st.pydeck_chart(map_chart, use_container_width=True, height=827)
+        # El mapa solo tiene opción HTML
+        create_download_section(map_chart, "Mapa Global de Terremotos", "map")
+    else:
+        st.info("📍 Sin datos para mostrar en el mapa")
 
+@st.fragment
+def fragmento_distribucion(cubo, huella):
+    """
+    Fragmento con la distribución de magnitudes y el top 5 de ubicaciones.
+    
+    Args:
+        cubo (pandas.DataFrame): Celdas del cubo que cumplen los filtros
+        huella (str): Huella del cubo para el cache de figuras (ver huella_datos)
+    """
+    st.markdown('<div class="chart-container">📊 Distribución de Magnitudes</div>', unsafe_allow_html=True)
+    mag_fig = figura_cacheada(distr, cubo, huella)
+    if mag_fig:
+        st.plotly_chart(mag_fig, use_container_width=True, config={"displayModeBar": False})
+        # Ahora ofrece HTML y JSON
+        create_download_section(mag_fig, "Distribución de Magnitudes", "chart")
+    else:
+        st.info("Sin datos de magnitud")
+
+    st.markdown('<div class="chart-container">📍 Top 5 Ubicaciones</div>', unsafe_allow_html=True)
+    loc_fig = figura_cacheada(torta, cubo, huella)
+    if loc_fig:
+        st.plotly_chart(loc_fig, use_container_width=True, config={"displayModeBar": False})
+        # Ahora ofrece HTML y JSON
+        create_download_section(loc_fig, "Top 5 Ubicaciones", "chart")
+    else:
+        st.info("Sin datos de ubicación")
+
+@st.fragment
+def fragmento_tendencias(cubo, huella):
+    """
+    Fragmento con las tendencias mensual, semanal y horaria.
+    
+    Args:
+        cubo (pandas.DataFrame): Celdas del cubo que cumplen los filtros
+        huella (str): Huella del cubo para el cache de figuras (ver huella_datos)
+    """
     col1, col2, col3 = st.columns(3)
     with col1:
         st.markdown('<div class="chart-container">📅 Tendencia Mensual</div>', unsafe_allow_html=True)
-        monthly = map_m(filtered)
+        monthly = figura_cacheada(map_m, cubo, huella)
         if monthly:
             st.plotly_chart(monthly, use_container_width=True, config={"displayModeBar": False})
             # Ahora ofrece HTML y JSON
             create_download_section(monthly, "Tendencia Mensual", "chart")
     with col2:
         st.markdown('<div class="chart-container">📅 Tendencia Semanal</div>', unsafe_allow_html=True)
-        weekly = map_s(filtered)
+        weekly = figura_cacheada(map_s, cubo, huella)
         if weekly:
             st.plotly_chart(weekly, use_container_width=True, config={"displayModeBar": False})
             # Ahora ofrece HTML y JSON
             create_download_section(weekly, "Tendencia Semanal", "chart")
     with col3:
         st.markdown('<div class="chart-container">📅 Tendencia Horaria</div>', unsafe_allow_html=True)
-        hourly = map_h(filtered)
+        hourly = figura_cacheada(map_h, cubo, huella)
         if hourly:
             st.plotly_chart(hourly, use_container_width=True, config={"displayModeBar": False})
             # Ahora ofrece HTML y JSON
             create_download_section(hourly, "Tendencia Horaria", "chart")
 
+def mostrar_panel_depuracion():
+    """
+    Función que muestra las tasas de aciertos de los caches del dashboard:
+    el cache de figuras de graficos y el motor de filtros.
+    """
+    with st.expander("🛠️ Depuración de caches", expanded=True):
+        st.markdown("**Cache de figuras**")
+        st.caption(f"{len(CACHE_FIGURAS.figuras)} de {CACHE_FIGURAS.max_entradas} figuras guardadas")
+        st.dataframe(CACHE_FIGURAS.estadisticas(), use_container_width=True, hide_index=True)
+
+        motor = get_motor_filtros()
+        estadisticas = motor.estadisticas
+        consultas_totales = estadisticas["aciertos"] + estadisticas["fallos"]
+        st.markdown("**Motor de filtros**")
+        st.caption(f"{len(motor.resultados)} resultados y {len(motor.dimensiones)} dimensiones guardadas")
+        st.dataframe(pd.DataFrame([{
+            "aciertos": estadisticas["aciertos"],
+            "fallos": estadisticas["fallos"],
+            "tasa_aciertos": round(estadisticas["aciertos"] / consultas_totales, 3) if consultas_totales else 0.0,
+            "aciertos_dimension": estadisticas["aciertos_dimension"],
+            "fallos_dimension": estadisticas["fallos_dimension"],
+        }]), use_container_width=True, hide_index=True)
+
 def show_footer():
     """
     Función que muestra el footer fijo en la parte inferior de la página
@@ -1,6 +1,26 @@
 import os
 import streamlit as st
+import almacen
 from paginas.sidebar import sidebar_exploracion
+from paginas.utils import load_data, load_documentos
+
+def con_documentos(df, columnas=None):
+    """
+    Función que agrega a las filas de df las columnas de texto pesadas del
+    almacén de documentos, leyendo solo los documentos de esas filas.
+    
+    Args:
+        df (pandas.DataFrame): Filas a completar (debe incluir la columna 'id')
+        columnas (list): Columnas de documentos a agregar; None para todas
+        
+    Returns:
+        pandas.DataFrame: Filas con las columnas de documentos, en el mismo orden
+    """
+    columnas = [col for col in (columnas if columnas is not None else almacen.COLUMNAS_DOCUMENTOS) if col not in df.columns]
+    if not columnas:
+        return df
+    documentos = load_documentos(tuple(df["id"].dropna()), tuple(columnas))
+    return df.merge(documentos, on="id", how="left").set_index(df.index)
 
 def show(df):
     """
@@ -16,6 +36,11 @@ def show(df):
         default_columns = ['titulo', 'autor', 'ciudad_o_pais', 'magnitud']
         columnas = [col for col in default_columns if col in df.columns]
     
+    if any(col not in df.columns and col not in almacen.COLUMNAS_DOCUMENTOS for col in columnas):  # Columnas que no carga el dashboard: leer todos los eventos
+        df = load_data(columnas=None)
+    columnas_documentos = [col for col in columnas if col in almacen.COLUMNAS_DOCUMENTOS]  # Se leen solo para las filas mostradas o exportadas
+    columnas_orden = [col for col in columnas if col not in almacen.COLUMNAS_DOCUMENTOS] or ["fecha_creacion"]
+    
     st.markdown("""
     <style>
         /* Centrar encabezados */
@@ -80,8 +105,8 @@ def show(df):
         with col1:
             sort_column = st.selectbox(
                 "Ordenar por:",
-                options=columnas,
-                index=columnas.index('magnitud') if 'magnitud' in columnas else 0
+                options=columnas_orden,
+                index=columnas_orden.index('magnitud') if 'magnitud' in columnas_orden else 0
             )
         
         with col2:
@@ -92,13 +117,13 @@ def show(df):
                 index=0
             )
         
-        sorted_df = filtered_df[columnas].sort_values(  # Usar DataFrame filtrado en lugar de original
+        sorted_df = filtered_df.sort_values(  # Usar DataFrame filtrado en lugar de original
             by=sort_column,
             ascending=(sort_order == "Ascendente")
         )
         
         st.dataframe(  # Mostrar tabla con opciones avanzadas
-            sorted_df.head(max_rows),
+            con_documentos(sorted_df.head(max_rows), columnas_documentos)[columnas],
             use_container_width=True,
             column_config={
                 "titulo": st.column_config.TextColumn(
@@ -211,13 +236,11 @@ def show(df):
                 )
                 
                 if include_all_columns:
-                    export_columns = filtered_df.columns.tolist()
+                    export_columns = almacen.COLUMNAS
                 else:
                     export_columns = columnas
-            elif export_option == "Solo datos filtrados":
-                export_columns = filtered_df.columns.tolist()
             else:
-                export_columns = df.columns.tolist()
+                export_columns = almacen.COLUMNAS
             
             filename = st.text_input(  # Nombre personalizado para el archivo
                 "Nombre del archivo (sin extensión):",
@@ -227,15 +250,28 @@ def show(df):
             
             st.markdown('</div>', unsafe_allow_html=True)
             
-        if export_option == "Datos filtrados y seleccionados":  # Preparar datos para exportación
-            if include_all_columns:
-                export_data = filtered_df.loc[sorted_df.index]
-            else:
-                export_data = sorted_df
+        if export_option == "Datos filtrados y seleccionados":  # Filas a exportar; los datos se arman recién al descargar
+            ids_exportar = sorted_df["id"]
         elif export_option == "Solo datos filtrados":
-            export_data = filtered_df
+            ids_exportar = filtered_df["id"]
         else:
-            export_data = df
+            ids_exportar = df["id"]
+
+        def datos_exportar():
+            """
+            Arma los datos a exportar con sus documentos. Se ejecuta solo al hacer
+            clic en descargar, así los reruns de la página no leen los documentos.
+            
+            Returns:
+                pandas.DataFrame: Datos a exportar
+            """
+            if export_option == "Datos filtrados y seleccionados":
+                if include_all_columns:
+                    return con_documentos(sorted_df[["id"]].merge(load_data(columnas=None), on="id", how="left"))
+                return con_documentos(sorted_df, columnas_documentos)[columnas]
+            elif export_option == "Solo datos filtrados":
+                return con_documentos(filtered_df[["id"]].merge(load_data(columnas=None), on="id", how="left"))
+            return con_documentos(load_data(columnas=None))
         
         col1, col2 = st.columns(2)  # Botones de descarga
         
@@ -243,24 +279,26 @@ def show(df):
             if export_format == "CSV":
                 st.download_button(
                     label="📥 Descargar CSV",
-                    data=export_data.to_csv(index=False).encode('utf-8'),
+                    data=lambda: datos_exportar().to_csv(index=False).encode('utf-8'),
                     file_name=f"{filename}.csv",
                     mime="text/csv",
                     help="Descargar los datos en formato CSV",
-                    key="download_csv"
+                    key="download_csv",
+                    on_click="ignore"
                 )
             else:
                 st.download_button(
                     label="📥 Descargar Excel",
-                    data=export_data.to_excel(index=False).encode('utf-8'),
+                    data=lambda: datos_exportar().to_excel(index=False).encode('utf-8'),
                     file_name=f"{filename}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     help="Descargar los datos en formato Excel",
-                    key="download_excel"
+                    key="download_excel",
+                    on_click="ignore"
                 )
         
         with col2:
-            st.info(f"Se exportarán {len(export_data):,} registros con {len(export_columns)} columnas")  # Mostrar información sobre lo que se va a descargar
+            st.info(f"Se exportarán {len(ids_exportar):,} registros con {len(export_columns)} columnas")  # Mostrar información sobre lo que se va a descargar
             
     else:
         st.error("❌ No hay datos disponibles para explorar.")
@@ -4,7 +4,7 @@ from paginas.sidebar import sidebar_presentacion
 import pandas as pd
 import plotly.express as px
 import pydeck as pdk
-from graficos import map_m, mapa
+from graficos import map_m, mapa, figura_cacheada
 from paginas.styles import *
 inject_css()
 
@@ -218,7 +218,7 @@ def show(df):
             
             with comp_col2:
                 st.markdown("#### 📊 Terremotos Detectados")
-                map_chart = mapa(df, solo_oficiales=False, mostrar_volcanes=True) 
+                map_chart = figura_cacheada(mapa, df, solo_oficiales=False, mostrar_volcanes=True) 
                 if map_chart:
                     st.pydeck_chart(map_chart, use_container_width=True, height=400)
                 else:
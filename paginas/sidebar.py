@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 import os
+import almacen
+import volcanes
 
 @st.dialog("  📤 Publicar Evento Sísmico")
 def mostrar_imagen_reddit():
@@ -58,58 +60,58 @@ def main_navigation():
     st.sidebar.markdown("---")
     return st.session_state.pagina_actual
 
-def sidebar_dashboard(df):
+def sidebar_dashboard(dominio):
     """
     Función que crea los controles de filtrado del sidebar para la página del dashboard,
     incluyendo filtros de fecha, magnitud, ubicación y opciones de visualización.
+    El interruptor de volcanes está junto al mapa (ver dashboard.fragmento_mapa)
+    para que cambiarlo redibuje solo el mapa.
+    Por defecto fecha, magnitud, ubicaciones y oficiales se editan en un
+    formulario y se aplican juntos con un botón, en un solo recálculo.
     
     Args:
-        df (pandas.DataFrame): DataFrame con datos de terremotos para crear filtros
+        dominio (dict): Rangos y ubicaciones disponibles (ver consultas.dominio_filtros)
         
     Returns:
-        tuple: (date_range, mag_range, locations, solo_oficiales, mostrar_volcanes)
+        tuple: (date_range, mag_range, locations, solo_oficiales, cercania, region)
+               con cercania y region según consultas.normalizar_filtros
     """
     st.sidebar.markdown("### 🔍 Filtros de Dashboard")
-    if df.empty:
-        return [], (0, 10), [], False, False
-    
-    # Verificar que la columna fecha_crea existe y tiene datos válidos
-    if "fecha_crea" not in df.columns:
-        st.sidebar.error("⚠️ Columna 'fecha_crea' no encontrada")
-        return [], (0, 10), [], False, False
+    if not dominio["total"]:
+        return [], (0, 10), [], False, None, None
     
-    # Asegurar que fecha_crea es datetime y filtrar valores válidos
-    df_fechas = df[df["fecha_crea"].notna()].copy()
-    if df_fechas.empty:
+    # Verificar que hay fechas válidas en los datos
+    if dominio["fecha_min"] is None:
         st.sidebar.warning("⚠️ No hay fechas válidas en los datos")
-        return [], (0, 10), [], False, False
+        return [], (0, 10), [], False, None, None
     
-    min_date = df_fechas["fecha_crea"].min().date()
-    max_date = df_fechas["fecha_crea"].max().date()
-    date_range = st.sidebar.date_input("📅 Rango de fechas", [min_date, max_date], key="dashboard_date_range")
+    # Con el modo de aplicar los filtros van en un formulario: los cambios quedan
+    # pendientes y se recalcula una sola vez al presionar "Aplicar filtros"
+    modo_aplicar = st.sidebar.toggle("✅ Aplicar filtros con botón", value=True, key="dashboard_modo_aplicar",
+                                     help="Agrupa los cambios de fecha, magnitud, ubicaciones y oficiales en un solo recálculo")
+    contenedor = st.sidebar.form("dashboard_filtros", border=False) if modo_aplicar else st.sidebar.container()
+
+    min_date = dominio["fecha_min"]
+    max_date = dominio["fecha_max"]
+    date_range = contenedor.date_input("📅 Rango de fechas", [min_date, max_date], key="dashboard_date_range")
     
-    # Verificar que magnitud existe y convertir a float
-    if "magnitud" in df.columns:
-        df_mag = df[df["magnitud"].notna()].copy()
-        df_mag["magnitud"] = pd.to_numeric(df_mag["magnitud"], errors="coerce")
-        df_mag = df_mag[df_mag["magnitud"].notna()]
-        
-        if not df_mag.empty:
-            mag_range = st.sidebar.slider("📊 Rango de magnitud", 
-                                        float(df_mag["magnitud"].min()), 
-                                        float(df_mag["magnitud"].max()), 
-                                        (float(df_mag["magnitud"].min()), float(df_mag["magnitud"].max())), 
-                                        key="dashboard_mag_range")
-        else:
-            mag_range = (0.0, 10.0)
+    if dominio["mag_min"] is not None:
+        mag_range = contenedor.slider("📊 Rango de magnitud", 
+                                    float(dominio["mag_min"]), 
+                                    float(dominio["mag_max"]), 
+                                    (float(dominio["mag_min"]), float(dominio["mag_max"])), 
+                                    key="dashboard_mag_range")
     else:
         mag_range = (0.0, 10.0)
     
-    locations = st.sidebar.multiselect("📍 Filtrar por ubicaciones", sorted(df["ciudad_o_pais"].dropna().unique()), key="dashboard_locations")
-    
-    st.sidebar.markdown("### 🌋 Opciones de visualización")
-    solo_oficiales = st.sidebar.checkbox("Mostrar solo oficiales", value=False, key="dashboard_solo_oficiales")
-    mostrar_volcanes = st.sidebar.checkbox("Mostrar volcanes", value=False, key="dashboard_mostrar_volcanes")
+    locations = contenedor.multiselect("📍 Filtrar por ubicaciones", dominio["ubicaciones"], key="dashboard_locations")
+    solo_oficiales = contenedor.checkbox("Mostrar solo oficiales", value=False, key="dashboard_solo_oficiales")
+    if modo_aplicar:
+        contenedor.form_submit_button("Aplicar filtros", type="primary", use_container_width=True)
+        st.sidebar.caption(resumen_filtros_aplicados(date_range, mag_range, locations, solo_oficiales))
+
+    cercania = sidebar_cercania_volcanes()  # Fuera del formulario: sus controles cambian según lo elegido
+    region = sidebar_region_mapa()
     
     # Botón para mostrar imagen
     st.sidebar.markdown("---")
@@ -118,7 +120,82 @@ def sidebar_dashboard(df):
     if st.sidebar.button(" Comunidad Reddit", use_container_width=True, key="btn_mostrar_imagen_reddit", help="Mostrar subreddit r/Earthquakes"):
         mostrar_imagen_reddit()
     
-    return date_range, mag_range, locations, solo_oficiales, mostrar_volcanes
+    return date_range, mag_range, locations, solo_oficiales, cercania, region
+
+def resumen_filtros_aplicados(date_range, mag_range, locations, solo_oficiales):
+    """
+    Función que describe los filtros que están aplicados en el dashboard. Los
+    cambios hechos en el formulario no llegan al servidor hasta aplicarlos, así
+    que el resumen muestra qué está vigente frente a lo que se está editando.
+    
+    Args:
+        date_range (list): Fechas aplicadas (inicio y fin, o solo inicio)
+        mag_range (tuple): Magnitudes aplicadas (mínima, máxima)
+        locations (list): Ubicaciones aplicadas
+        solo_oficiales (bool): Si solo se muestran posts oficiales
+        
+    Returns:
+        str: Resumen en markdown de los filtros aplicados
+    """
+    fechas = " → ".join(str(fecha) for fecha in date_range) if date_range else "todas"
+    ubicaciones = f"{len(locations)} ubicación{'es' if len(locations) > 1 else ''}" if locations else "todas las ubicaciones"
+    oficiales = " • solo oficiales" if solo_oficiales else ""
+    return f"**Aplicados:** {fechas} • magnitud {mag_range[0]:.1f}–{mag_range[1]:.1f} • {ubicaciones}{oficiales}. Los cambios quedan pendientes hasta presionar *Aplicar filtros*."
+
+def sidebar_region_mapa():
+    """
+    Función que crea el filtro por región del mapa del dashboard: un rectángulo
+    de latitudes y longitudes o un polígono ingresado como un vértice
+    "latitud, longitud" por línea.
+    
+    Returns:
+        tuple: (lat_min, lat_max, lon_min, lon_max), lista de vértices
+               [(lat, lon), ...] o None si el filtro no está activo o no es válido
+    """
+    tipo = st.sidebar.radio("🗺️ Región del mapa", ["Sin región", "Rectángulo", "Polígono"], horizontal=True, key="dashboard_region_tipo")
+    if tipo == "Rectángulo":
+        col_lat, col_lon = st.sidebar.columns(2)
+        lat_min = col_lat.number_input("Latitud mín.", -90.0, 90.0, -60.0, key="dashboard_region_lat_min")
+        lat_max = col_lat.number_input("Latitud máx.", -90.0, 90.0, 15.0, key="dashboard_region_lat_max")
+        lon_min = col_lon.number_input("Longitud mín.", -180.0, 180.0, -90.0, key="dashboard_region_lon_min", help="Si es mayor que la máxima, el rectángulo cruza el antimeridiano")
+        lon_max = col_lon.number_input("Longitud máx.", -180.0, 180.0, -30.0, key="dashboard_region_lon_max")
+        return (lat_min, lat_max, lon_min, lon_max)
+    if tipo == "Polígono":
+        texto = st.sidebar.text_area("Vértices (latitud, longitud por línea)", "-18, -75\n-18, -68\n-56, -66\n-56, -76", key="dashboard_region_poligono")
+        try:
+            vertices = [tuple(float(valor) for valor in linea.split(",")) for linea in texto.splitlines() if linea.strip()]
+        except ValueError:
+            vertices = []
+        if len(vertices) < 3 or any(len(vertice) != 2 or abs(vertice[0]) > 90 or abs(vertice[1]) > 180 for vertice in vertices):
+            st.sidebar.warning("⚠️ El polígono necesita al menos 3 vértices válidos")
+            return None
+        return vertices
+    return None
+
+def sidebar_cercania_volcanes():
+    """
+    Función que crea el filtro de cercanía a volcanes del dashboard: eventos a
+    menos de cierta distancia de cualquier volcán o de un volcán elegido.
+    
+    Returns:
+        tuple: (km,) para cualquier volcán, (latitud, longitud, km) para un
+               volcán elegido, o None si el filtro no está activo
+    """
+    datos = volcanes.cargar_volcanes()
+    if datos is None or len(datos.latitud) == 0:
+        return None
+    opciones = [-2, -1, *range(len(datos.latitud))]  # -2: sin filtro, -1: cualquier volcán, i: volcán i
+    eleccion = st.sidebar.selectbox(
+        "🌋 Cercanía a volcanes", opciones,
+        format_func=lambda i: {-2: "Sin filtro", -1: "Cualquier volcán"}.get(i) or f"{datos.nombres[i]} ({datos.latitud[i]:.2f}, {datos.longitud[i]:.2f})",
+        key="dashboard_volcan"
+    )
+    radio_km = st.sidebar.slider("📏 Distancia máxima (km)", 10, 2000, 200, step=10, key="dashboard_radio_km", disabled=eleccion == -2)
+    if eleccion == -2:
+        return None
+    if eleccion == -1:
+        return (radio_km,)
+    return (datos.latitud[eleccion], datos.longitud[eleccion], radio_km)
 
 def sidebar_exploracion(df):
     """
@@ -136,7 +213,7 @@ def sidebar_exploracion(df):
         return [], 20, "Todos"
     
     # Selector de columnas
-    columnas = st.sidebar.multiselect("🏷️ Seleccionar columnas", df.columns.tolist(), default=[], key="exploracion_columns")
+    columnas = st.sidebar.multiselect("🏷️ Seleccionar columnas", almacen.COLUMNAS, default=[], key="exploracion_columns")  # Todas las columnas del histórico, aunque df traiga solo algunas
     
     # Número máximo de filas
     max_rows = st.sidebar.slider("📄 Número máximo de filas", 5, 100, 20, key="exploracion_max_rows")
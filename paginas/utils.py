@@ -1,29 +1,38 @@
 import os
 import pandas as pd
 import streamlit as st
-import plotly.io as pio
-import json
+import almacen
+import consultas
+from graficos import artefacto_descarga
 import base64
 from io import BytesIO
 
+# Columnas que usan el dashboard y los gráficos; el resto se lee solo cuando se pide
+COLUMNAS_DASHBOARD = ["titulo", "id", "autor", "fecha_creacion", "fecha_crea", "hora_crea", "hora",
+                      "ciudad_o_pais", "magnitud", "tipo_magnitud", "latitud", "longitud"]
+
 @st.cache_data
-def load_data():
+def load_data(columnas=tuple(COLUMNAS_DASHBOARD)):
     """
-    Función que carga y procesa los datos de terremotos desde un archivo CSV.
-    Realiza limpieza de datos, conversión de tipos y filtrado de coordenadas válidas.
-    Utiliza cache de Streamlit para optimizar el rendimiento.
+    Función que carga y procesa los datos de terremotos desde el almacén
+    histórico en Parquet (ver almacen.py), que se crea a partir del CSV
+    original la primera vez. Solo se leen las columnas pedidas, ya tipadas
+    según el esquema del almacén; se agregan las columnas de tiempo del evento
+    (event_ts, hour, weekday, month) y se filtran coordenadas y magnitudes
+    válidas. Utiliza cache de Streamlit para optimizar el rendimiento.
+    
+    Args:
+        columnas (tuple): Columnas a cargar; None para todas las de la tabla de
+                          eventos (los textos pesados se cargan con load_documentos)
     
     Returns:
         pandas.DataFrame: DataFrame con datos de terremotos procesados y limpios,
                          o DataFrame vacío si hay error al cargar el archivo
     """
-    path = os.path.join(os.getcwd(), "data", "Earthquakes_posts_new.csv")
     try:
-        df = pd.read_csv(path)
+        df = almacen.leer_historico(list(columnas) if columnas is not None else None)
+        df = consultas.agregar_tiempo_evento(df)  # event_ts, hour, weekday y month, calculados una sola vez
         df["fecha_crea"] = pd.to_datetime(df["fecha_crea"], errors="coerce", utc=True)
-        df["latitud"] = pd.to_numeric(df["latitud"].astype(str).str.replace(",", "."), errors="coerce")
-        df["longitud"] = pd.to_numeric(df["longitud"].astype(str).str.replace(",", "."), errors="coerce")
-        df["magnitud"] = pd.to_numeric(df["magnitud"], errors="coerce")  # Asegurar que magnitud sea numérica
         df = df.dropna(subset=["latitud", "longitud", "magnitud"])
         df = df[(df["latitud"] >= -90) & (df["latitud"] <= 90)]
         df = df[(df["longitud"] >= -180) & (df["longitud"] <= 180)]
@@ -34,6 +43,94 @@ def load_data():
         st.error("Archivo CSV no encontrado.")
         return pd.DataFrame()
 
+@st.cache_data
+def load_dominio():
+    """
+    Función que obtiene los rangos de fecha y magnitud y las ubicaciones
+    disponibles para los filtros del dashboard, con agregados en SQLite.
+    
+    Returns:
+        dict: Dominio de los filtros (ver consultas.dominio_filtros)
+    """
+    return consultas.dominio_filtros()
+
+@st.cache_resource
+def get_motor_filtros():
+    """
+    Función que crea el motor de filtros del dashboard, compartido por todas
+    las sesiones para reutilizar sus caches (ver consultas.MotorFiltros).
+    
+    Returns:
+        consultas.MotorFiltros: Motor de filtros
+    """
+    return consultas.MotorFiltros()
+
+@st.cache_data(max_entries=16)
+def load_eventos_filtrados(filtros):
+    """
+    Función que obtiene solo los eventos que cumplen los filtros del sidebar del
+    dashboard. Los filtros normalizados son la clave del cache, así un rerun que
+    no cambia los filtros (abrir un diálogo, una descarga) no vuelve a
+    filtrar; el motor de filtros resuelve cada dimensión con los índices de
+    SQLite y reutiliza las que no cambiaron.
+    
+    Args:
+        filtros (consultas.Filtros): Filtros normalizados (ver consultas.normalizar_filtros)
+        
+    Returns:
+        pandas.DataFrame: Eventos filtrados
+    """
+    return get_motor_filtros().eventos(filtros)
+
+@st.cache_data(max_entries=16)
+def load_celdas(filtros, nivel):
+    """
+    Función que obtiene los eventos que cumplen los filtros del dashboard
+    agregados en celdas de la grilla espacial, para el mapa con muchos eventos.
+    
+    Args:
+        filtros (consultas.Filtros): Filtros normalizados (ver consultas.normalizar_filtros)
+        nivel (int): Nivel de la grilla (ver graficos.nivel_mapa)
+        
+    Returns:
+        pandas.DataFrame: Celdas con conteo, magnitud máxima y promedio
+    """
+    return get_motor_filtros().celdas(filtros, nivel)
+
+@st.cache_data(max_entries=16)
+def load_cubo(filtros):
+    """
+    Función que obtiene la porción del cubo de conteos que cumple los filtros
+    del dashboard, suficiente para las métricas y los gráficos agregados sin
+    cargar los eventos. El cubo no tiene dimensiones espaciales: con los
+    filtros de cercanía a volcanes o región del mapa las celdas se arman a
+    partir de los eventos filtrados.
+    
+    Args:
+        filtros (consultas.Filtros): Filtros normalizados (ver consultas.normalizar_filtros)
+        
+    Returns:
+        pandas.DataFrame: Celdas del cubo con su columna 'conteo'
+    """
+    if not consultas.usa_cubo(filtros):
+        return consultas.cubo_de_eventos(load_eventos_filtrados(filtros))
+    return consultas.consultar_cubo(filtros)
+
+@st.cache_data(max_entries=32)
+def load_documentos(ids, columnas=None):
+    """
+    Función que carga del almacén de documentos las columnas de texto pesadas
+    (texto_post, comentarios, media, thumbnail, url) solo para los posts dados.
+    
+    Args:
+        ids (tuple): Ids de Reddit de los posts
+        columnas (tuple): Columnas de documentos a cargar; None para todas
+        
+    Returns:
+        pandas.DataFrame: DataFrame con la columna id y las columnas pedidas
+    """
+    return almacen.leer_documentos(list(ids), list(columnas) if columnas is not None else None)
+
 def clear_sidebar():
     """
     Función auxiliar que limpia el contenido del sidebar almacenado en el session_state.
@@ -45,7 +142,9 @@ def clear_sidebar():
 
 def download_plotly_chart(fig, filename="chart", chart_type="png"):
     """
-    Función para crear un botón de descarga para gráficos de Plotly.
+    Función para crear un botón de descarga para gráficos de Plotly. El
+    archivo se genera recién al hacer clic y se guarda junto a la figura
+    (ver graficos.CacheFiguras.artefacto).
     
     Args:
         fig: Figura de Plotly
@@ -59,29 +158,28 @@ def download_plotly_chart(fig, filename="chart", chart_type="png"):
     try:
         # Ofrecer HTML interactivo (siempre funciona sin Kaleido/Chrome)
         if chart_type == 'html' or chart_type in ['png', 'jpg', 'pdf', 'svg']:
-            html_bytes = pio.to_html(fig, include_plotlyjs='cdn').encode()
-            
             # Si pidieron un formato de imagen, ofrecer HTML pero avisar
             if chart_type in ['png', 'jpg', 'pdf', 'svg']:
                 st.info(f"💡 La descarga como {chart_type.upper()} no está disponible en Streamlit Cloud. Se ofrece HTML como alternativa.")
             
             st.download_button(
                 label="📥 Descargar como HTML",
-                data=html_bytes,
+                data=lambda: artefacto_descarga(fig, "html"),  # Se serializa solo al descargar
                 file_name=f"{filename}.html",
                 mime="text/html",
-                key=f"download_{filename}_html"
+                key=f"download_{filename}_html",
+                on_click="ignore"  # Descargar no vuelve a ejecutar la página
             )
             
         # Ofrecer JSON como alternativa (datos brutos para procesamiento posterior)
         elif chart_type == 'json':
-            json_bytes = json.dumps(fig.to_dict()).encode()
             st.download_button(
                 label="📥 Descargar como JSON",
-                data=json_bytes,
+                data=lambda: artefacto_descarga(fig, "json"),
                 file_name=f"{filename}.json",
                 mime="application/json",
-                key=f"download_{filename}_json"
+                key=f"download_{filename}_json",
+                on_click="ignore"  # Descargar no vuelve a ejecutar la página
             )
             
     except Exception as e:
@@ -91,7 +189,7 @@ def download_plotly_chart(fig, filename="chart", chart_type="png"):
 def download_pydeck_map(deck_obj, filename="mapa"):
     """
     Función para crear un botón de descarga para mapas de PyDeck.
-    Genera un archivo HTML con el mapa interactivo.
+    Genera un archivo HTML con el mapa interactivo al hacer clic.
     
     Args:
         deck_obj: Objeto PyDeck Deck
@@ -102,15 +200,13 @@ def download_pydeck_map(deck_obj, filename="mapa"):
         return
     
     try:
-        # Convertir el mapa a HTML
-        html_content = deck_obj.to_html(as_string=True)
-        
-        st.download_button(
+        st.download_button(  # El HTML del mapa se genera solo al descargar
             label="📥 Descargar Mapa como HTML",
-            data=html_content.encode(),
+            data=lambda: artefacto_descarga(deck_obj, "html"),
             file_name=f"{filename}.html",
             mime="text/html",
-            key=f"download_{filename}_map"
+            key=f"download_{filename}_map",
+            on_click="ignore"
         )
         
     except Exception as e:
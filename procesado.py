@@ -1,20 +1,81 @@
 import pandas as pd
-import time 
-import google.generativeai as genai
+import asyncio
+from google import genai
 import os
-import datetime
-import numpy as np
 import re
 from credenciales import *
+import cache_extraccion
+import extractor_bot
+import cliente_llm
+import geocoder
+import almacen
+
+gemini_keys = [d]  # Agregar más claves para repartir las llamadas entre ellas
+
+PATRON_FECHA_UTC = r'(\d{4}-\d{2}-\d{2})\s(\d{2}:\d{2}:\d{2})\s*UTC'  # Fechas "YYYY-MM-DD HH:MM:SS UTC" en el texto
+
+
+def extraer_fecha_hora_texto(textos):
+    """
+    Extrae de forma vectorizada la primera fecha "YYYY-MM-DD HH:MM:SS UTC" de
+    cada texto, con un solo str.extract y un solo to_datetime de formato fijo.
+    
+    Args:
+        textos (pandas.Series): Textos de los posts
+        
+    Returns:
+        pandas.Series: Fechas tz-naive (UTC) o NaT si el texto no contiene una fecha válida
+    """
+    partes = textos.fillna("").astype(str).str.extract(PATRON_FECHA_UTC)
+    return pd.to_datetime(partes[0] + " " + partes[1], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+
+
+def normalizar_fechas_reddit(df):
+    """
+    Normaliza las fechas de los posts de Reddit de forma vectorizada (sin
+    recorrer filas en Python): convierte fecha_creacion (timestamp Unix o
+    string) a datetime tz-naive, extrae la fecha del evento del texto y crea
+    fecha_crea y hora_crea.
+    
+    Args:
+        df (pandas.DataFrame): DataFrame leído de datos_reddit.csv
+        
+    Returns:
+        pandas.DataFrame: El mismo DataFrame con fecha_creacion, fecha_crea,
+                         hora_crea y la columna auxiliar fecha_hora_texto
+                         (fecha encontrada en el texto o NaT)
+    """
+    fecha_num = pd.to_numeric(df["fecha_creacion"], errors="coerce")  # Timestamps Unix (números)
+    mask_timestamp = fecha_num.notna()
+    
+    fechas = pd.to_datetime(fecha_num, unit="s", errors="coerce")  # NaT en las filas que no son timestamps
+    if (~mask_timestamp).any():  # Para los que no son timestamps, parsear como fecha
+        fechas_string = pd.to_datetime(
+            df["fecha_creacion"].where(~mask_timestamp),
+            errors="coerce",
+            format="mixed",
+            utc=True
+        ).dt.tz_localize(None)  # Convertir a tz-naive
+        fechas = fechas.where(mask_timestamp, fechas_string)
+    df["fecha_creacion"] = fechas
+    
+    df["texto_post"] = df["texto_post"].fillna("")  # Llenar valores nulos en texto
+    df["titulo"] = df["titulo"].fillna("")
+    
+    df["fecha_hora_texto"] = extraer_fecha_hora_texto(df["texto_post"])  # Fecha del evento dentro del texto, si existe
+    
+    fecha_evento = df["fecha_hora_texto"].fillna(df["fecha_creacion"])  # Usar fechas extraídas del texto si están disponibles
+    df["fecha_crea"] = fecha_evento.dt.strftime("%Y-%m-%d")
+    df["hora_crea"] = fecha_evento.dt.strftime("%H:%M:%S")
+    return df
 
-gemini_keys = [d]
-genai.configure(api_key=gemini_keys[0])
 
 def load_data_reddit():
     """
     Carga y procesa datos de terremotos desde un archivo CSV de Reddit.
     Maneja conversión de timestamps Unix y strings de fecha, extrae información
-    temporal del contenido de los posts y normaliza formatos de fecha/hora.
+    temporal del contenido de los posts y normaliza formatos de fecha/hora
+    (ver normalizar_fechas_reddit).
     
     Returns:
         pandas.DataFrame: DataFrame con datos de Reddit procesados y columnas
@@ -25,179 +86,302 @@ def load_data_reddit():
     """
     file_path = os.path.join(os.getcwd(), "data", "datos_reddit.csv")
     if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        
-        df["fecha_creacion_dt"] = pd.NaT  # Crear una nueva columna para evitar el warning de tipos incompatibles
-        
-        try:
-            df_temp = df.copy()  # Primero intentar convertir como timestamp Unix (números)
-            df_temp["fecha_num"] = pd.to_numeric(df["fecha_creacion"], errors="coerce")
-            
-            mask_timestamp = df_temp["fecha_num"].notna()  # Crear máscara para identificar qué valores son timestamps
-            
-            if mask_timestamp.any():  # Convertir timestamps a datetime
-                fechas_timestamp = pd.to_datetime(
-                    df_temp.loc[mask_timestamp, "fecha_num"], 
-                    unit='s',
-                    utc=True
-                ).dt.tz_localize(None)  # Convertir a tz-naive
-                df.loc[mask_timestamp, "fecha_creacion_dt"] = fechas_timestamp
-            
-            if (~mask_timestamp).any():  # Para los que no son timestamps, intentar parsear como fecha
-                fechas_string = pd.to_datetime(
-                    df.loc[~mask_timestamp, "fecha_creacion"],
-                    errors="coerce",
-                    format="mixed"
-                )
-                df.loc[~mask_timestamp, "fecha_creacion_dt"] = fechas_string
-            
-            df["fecha_creacion"] = df["fecha_creacion_dt"]  # Reemplazar la columna original
-            df = df.drop(columns=["fecha_creacion_dt"])
-            
-        except Exception as e:
-            print(f"Error al procesar fechas: {e}")
-            df["fecha_creacion"] = pd.to_datetime(df["fecha_creacion"], errors="coerce")  # Si falla, intentar conversión directa
-        
-        df["fecha_creacion"] = pd.to_datetime(df["fecha_creacion"], errors="coerce").dt.tz_localize(None)  # Asegurar que fecha_creacion sea datetime y sin zona horaria (tz-naive)
-        
-        df["fecha_crea"] = df["fecha_creacion"].dt.strftime("%Y-%m-%d")  # Crear columnas de fecha y hora solo si fecha_creacion es válida
-        df["hora_crea"] = df["fecha_creacion"].dt.strftime("%H:%M:%S")
+        df = normalizar_fechas_reddit(pd.read_csv(file_path))
+        print(f"Datos cargados - shape: {df.shape}")
+        return df
+    else:
+        raise FileNotFoundError(f"El archivo {file_path} no existe.")
+
+MODELO_GEMINI = "gemma-3-1b-it"  # Usar gemini-1.5-flash en lugar de gemini-pro gemma-3-1b-it
+TAMANO_LOTE = 10  # Posts que se envían juntos en una sola llamada al modelo
+LLAMADAS_POR_MINUTO = 15  # Cuota de llamadas por minuto de cada API key
+LLAMADAS_POR_DIA = None  # Cuota diaria de cada API key (None = sin límite)
+ENFRIAMIENTO_CLAVE = 60  # Segundos sin usar una clave tras un 429
+CONCURRENCIA_LLM = 4  # Llamadas simultáneas como máximo
+VERSION_PROMPT = "v3-lugar"  # Cambiar al modificar los prompts para invalidar el cache
+VERSION_EXTRACCION = f"{MODELO_GEMINI}:{VERSION_PROMPT}"
+RESULTADO_VACIO = ["indeterminado", "0"]
+
+
+def prompt_individual(texto, titulo):
+    """
+    Construye el prompt para extraer la información sísmica de un único post.
+    
+    Args:
+        texto (str): Texto del post
+        titulo (str): Título del post
         
-        def extraer_fecha_hora(texto):  # Extraer fecha y hora del texto_post si contiene formato "YYYY-MM-DD HH:MM:SS UTC"
-            if pd.isna(texto):
-                return None, None
-            
-            patron = r'(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})\s*UTC'  # Patrón para buscar fechas en formato "YYYY-MM-DD HH:MM:SS UTC"
-            match = re.search(patron, texto)
-            
-            if match:
-                fecha_hora_str = match.group(1)
-                try:
-                    fecha_hora = pd.to_datetime(fecha_hora_str)
-                    return fecha_hora.strftime("%Y-%m-%d"), fecha_hora.strftime("%H:%M:%S")
-                except:
-                    return None, None
-            return None, None
+    Returns:
+        str: Prompt listo para enviar al modelo
+    """
+    return (
+        "Ejemplo: Texto: 'Un terremoto de magnitud 6.3 golpeó Lima, Perú.' → [Lima, 6.3]\n\n"
+        "Formato de respuesta: [lugar, magnitud (decimal)]. "
+        f"Extrae del siguiente texto la ciudad o país donde ocurrió el evento sísmico, detectalo en cualquier idioma: {texto}. "
+        f"Si no hay ciudad, devuelve el país. Si ninguno está presente, proporciona una ciudad cercana, pero evita colocar indeterminado. "
+        f"Usa números decimales con '.' para la magnitud. "
+        f"Si no hay texto, usa 'indeterminado'. Si el lugar es indeterminado, busca en el título: {titulo}. "
+        f"Si no hay información en el título, devuelve 'indeterminado' para lugar y 0 para magnitud. "
+        f"Si hay múltiples lugares, elige el más relevante. "
+        f"Devuelve solo los valores en el orden correcto, sin explicaciones."
+    )
+
+
+def prompt_lote(posts):
+    """
+    Construye un prompt que agrupa varios posts numerados para extraerlos en una
+    sola llamada. El modelo debe responder una línea por post con su índice.
+    
+    Args:
+        posts (list): Lista de tuplas (indice, texto, titulo)
         
-        df["fecha_texto"] = None  # Aplicar extracción a texto_post
-        df["hora_texto"] = None
+    Returns:
+        str: Prompt listo para enviar al modelo
+    """
+    bloques = "\n\n".join(
+        f"### POST {indice}\nTítulo: {titulo}\nTexto: {texto if texto else 'indeterminado'}"
+        for indice, texto, titulo in posts
+    )
+    return (
+        "Ejemplo: Texto: 'Un terremoto de magnitud 6.3 golpeó Lima, Perú.' → [Lima, 6.3]\n\n"
+        "Recibirás varios posts numerados. Para cada post responde exactamente una línea con el formato: "
+        "indice: [lugar, magnitud (decimal)]. "
+        "Extrae de cada texto la ciudad o país donde ocurrió el evento sísmico, detectalo en cualquier idioma. "
+        "Si no hay ciudad, devuelve el país. Si ninguno está presente, proporciona una ciudad cercana, pero evita colocar indeterminado. "
+        "Usa números decimales con '.' para la magnitud. "
+        "Si el lugar es indeterminado en el texto, busca en el título del mismo post. "
+        "Si no hay información en el título, devuelve 'indeterminado' para lugar y 0 para magnitud. "
+        "Si hay múltiples lugares, elige el más relevante. "
+        "No mezcles información entre posts. Devuelve solo las líneas en orden, sin explicaciones.\n\n"
+        f"{bloques}"
+    )
+
+
+def parsear_resultado(texto):
+    """
+    Convierte la respuesta de un post ("[lugar, magnitud]") en una lista de
+    2 strings, completando con "0" la magnitud si falta.
+    
+    Args:
+        texto (str): Respuesta del modelo para un post
         
-        df["texto_post"] = df["texto_post"].fillna("")  # Llenar valores nulos en texto
-        df["titulo"] = df["titulo"].fillna("")
+    Returns:
+        list: [lugar, magnitud] como strings
+    """
+    if "[" in texto and "]" in texto:
+        resultado = texto.split("[")[1].split("]")[0].split(",")
+        resultado = [item.strip() for item in resultado]
+        while len(resultado) < 2:
+            resultado.append("0")
+        return resultado
+    return list(RESULTADO_VACIO)
+
+
+def parsear_lote(texto, indices):
+    """
+    Separa la respuesta de un lote en resultados por índice de post. Solo se
+    aceptan líneas cuyo índice pertenece al lote; los posts sin línea válida
+    quedan fuera del diccionario para reintentarlos de forma individual.
+    
+    Args:
+        texto (str): Respuesta completa del modelo para el lote
+        indices (list): Índices de los posts enviados en el lote
         
-        for idx, row in df.iterrows():  # Extraer fechas del texto_post
-            fecha, hora = extraer_fecha_hora(row["texto_post"])
-            if fecha and hora:
-                df.at[idx, "fecha_texto"] = fecha
-                df.at[idx, "hora_texto"] = hora
+    Returns:
+        dict: {indice: [lugar, magnitud]}
+    """
+    esperados = set(indices)
+    resultados = {}
+    for linea in texto.splitlines():
+        match = re.match(r'\s*(?:POST\s*)?(\d+)\s*[:.)\-]\s*(\[.*?\])', linea)
+        if match:
+            indice = int(match.group(1))
+            if indice in esperados and indice not in resultados:
+                resultados[indice] = parsear_resultado(match.group(2))
+    return resultados
+
+
+class ModeloGemini:
+    """
+    Modelo de Gemini con su propio cliente de google-genai, y por lo tanto su
+    propia API key, con la interfaz que usa cliente_llm.ClienteLLM.
+    """
+
+    def __init__(self, clave, modelo=MODELO_GEMINI):
+        self.cliente = genai.Client(api_key=clave)
+        self.modelo = modelo
+
+    async def generate_content_async(self, prompt):
+        return await self.cliente.aio.models.generate_content(model=self.modelo, contents=prompt)
+
+
+def crear_modelo(clave):
+    """
+    Crea un modelo de Gemini que usa su propia API key.
+    
+    Args:
+        clave (str): API key de Gemini
         
-        mask_fecha_texto = df["fecha_texto"].notna()  # Usar fechas extraídas del texto si están disponibles
-        if mask_fecha_texto.any():
-            df.loc[mask_fecha_texto, "fecha_crea"] = df.loc[mask_fecha_texto, "fecha_texto"]
-            df.loc[mask_fecha_texto, "hora_crea"] = df.loc[mask_fecha_texto, "hora_texto"]
+    Returns:
+        ModeloGemini: Modelo asociado a la clave
+    """
+    return ModeloGemini(clave)
+
+
+def crear_pool_claves(claves=None):
+    """
+    Crea el pool de API keys con las cuotas configuradas en este módulo.
+    
+    Args:
+        claves (list): API keys a usar (por defecto gemini_keys)
         
-        df = df.drop(columns=["fecha_texto", "hora_texto"], errors="ignore")  # Eliminar columnas temporales
+    Returns:
+        cliente_llm.PoolClaves: Pool listo para ClienteLLM
+    """
+    return cliente_llm.PoolClaves(
+        claves or gemini_keys,
+        crear_modelo,
+        por_minuto=LLAMADAS_POR_MINUTO,
+        por_dia=LLAMADAS_POR_DIA,
+        enfriamiento=ENFRIAMIENTO_CLAVE
+    )
+
+
+async def extraer_posts(pool, posts, tamano_lote=TAMANO_LOTE):
+    """
+    Extrae la información sísmica de los posts con llamadas concurrentes al modelo
+    a través de ClienteLLM (reparto entre API keys, límite de llamadas por minuto
+    por clave, concurrencia acotada y reintentos con backoff). Primero se envían los lotes; los posts que no aparecen
+    en la respuesta de su lote, o todo el lote si la llamada falla, se reintentan
+    uno a uno con el prompt individual.
+    
+    Args:
+        pool (cliente_llm.PoolClaves): Pool de API keys a usar
+        posts (list): Lista de tuplas (indice, texto, titulo)
+        tamano_lote (int): Número de posts por llamada al modelo
         
-        print(f"Datos cargados - shape: {df.shape}")
-        return df
-    else:
-        raise FileNotFoundError(f"El archivo {file_path} no existe.")
+    Returns:
+        dict: {indice: [lugar, magnitud]} para todos los posts,
+              con None en los posts cuyo reintento individual también falló
+    """
+    cliente = cliente_llm.ClienteLLM(pool, concurrencia=CONCURRENCIA_LLM)
+    tamano_lote = max(1, int(tamano_lote))
+    lotes = [posts[inicio:inicio + tamano_lote] for inicio in range(0, len(posts), tamano_lote)]
+    resultados = {}
+
+    respuestas = await cliente.generar_todos({
+        numero: prompt_lote(lote) if len(lote) > 1 else prompt_individual(lote[0][1], lote[0][2])
+        for numero, lote in enumerate(lotes)
+    })
+    for numero, lote in enumerate(lotes):
+        respuesta = respuestas[numero]
+        indices = [indice for indice, _, _ in lote]
+        if isinstance(respuesta, Exception):
+            print(f"Error procesando lote {indices[0]}-{indices[-1]}: {respuesta}")
+        elif len(lote) > 1:
+            resultados.update(parsear_lote(respuesta, indices))
+        else:
+            resultados[indices[0]] = parsear_resultado(respuesta)
+    print(f"Procesados {len(resultados)} de {len(posts)} posts en {len(lotes)} lotes...")  # Mostrar progreso
+
+    pendientes = [(indice, texto, titulo) for indice, texto, titulo in posts if indice not in resultados]
+    if pendientes:  # Reintentar por fila lo que los lotes no resolvieron
+        respuestas = await cliente.generar_todos({
+            indice: prompt_individual(texto, titulo) for indice, texto, titulo in pendientes
+        })
+        for indice, respuesta in respuestas.items():
+            if isinstance(respuesta, Exception):
+                print(f"Error procesando fila {indice}: {respuesta}")
+                resultados[indice] = None
+            else:
+                resultados[indice] = parsear_resultado(respuesta)
+
+    print(f"Llamadas al modelo: {cliente.estadisticas}")
+    for uso in pool.uso():  # Uso por API key
+        print(f"API key {uso['clave']}: {uso['llamadas']} llamadas, {uso['exitos']} éxitos, "
+              f"{uso['errores_429']} errores 429, {uso['errores']} otros errores")
+    return resultados
 
-def procesar_con_gemini(df):
+
+def procesar_con_gemini(df, tamano_lote=TAMANO_LOTE):
     """
     Procesa datos de terremotos usando la API de Google Gemini para extraer
-    información estructurada (ubicación, magnitud, coordenadas) del texto libre.
+    información estructurada (ubicación y magnitud) del texto libre. Las
+    coordenadas no se piden al modelo: se obtienen del lugar con el gazetteer
+    local (ver geocoder.py).
+    Los posts se envían en lotes de `tamano_lote` por llamada, de forma concurrente
+    y limitada por LLAMADAS_POR_MINUTO, y cada resultado se asigna a su fila por
+    índice; con tamano_lote=1 se usa una llamada por post.
+    Los posts con la plantilla de BrainstormBot se extraen antes con expresiones
+    regulares (ver extractor_bot.py) y solo se consulta al modelo por los demás
+    posts que no están en el cache de extracciones (ver cache_extraccion.py);
+    los nuevos resultados se guardan en él.
     
     Args:
         df (pandas.DataFrame): DataFrame con columnas 'texto_post' y 'titulo'
+        tamano_lote (int): Número de posts por llamada al modelo
         
     Returns:
         pandas.DataFrame: DataFrame enriquecido con columnas extraídas:
-                         ciudad_o_pais, magnitud, latitud, longitud
+                         ciudad_o_pais, magnitud, latitud, longitud, tipo_magnitud
     """
-    model = genai.GenerativeModel("gemma-3-1b-it")  # Usar gemini-1.5-flash en lugar de gemini-pro gemma-3-1b-it
-    resultados_ciudad = []
-    resultados_magnitud = []
-    resultados_latitud = []
-    resultados_longitud = []
-    resultados_fecha_texto = []
-    resultados_hora_texto = []
-
-    for index, row in df.iterrows():  # Procesar cada post
-        texto = row["texto_post"]
-        titulo = row["titulo"]
-
-        try:
-            fecha_texto = None  # Primero extraer fecha y hora del texto si existe
-            hora_texto = None
-            
-            patron_fecha = r'(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})\s*UTC'
-            match_fecha = re.search(patron_fecha, texto)
-            if match_fecha:
-                fecha_hora_str = match_fecha.group(1)
-                try:
-                    fecha_hora = pd.to_datetime(fecha_hora_str)
-                    fecha_texto = fecha_hora.strftime("%Y-%m-%d")
-                    hora_texto = fecha_hora.strftime("%H:%M:%S")
-                except:
-                    pass
-            
-            prompt = (  # Ahora extraer información del terremoto
-                "Ejemplo: Texto: 'Un terremoto de magnitud 6.3 golpeó Lima, Perú.' → [Lima, 6.3, -12.0464, -77.0428]\n\n"
-                "Formato de respuesta: [lugar, magnitud (decimal), latitud (decimal), longitud (decimal)]. "
-                f"Extrae del siguiente texto la ciudad o país donde ocurrió el evento sísmico, detectalo en cualquier idioma: {texto}. "
-                f"Si no hay ciudad, devuelve el país. Si ninguno está presente, proporciona una ciudad cercana, pero evita colocar indeterminado. "
-                f"Usa números decimales con '.' para magnitud, latitud y longitud. "
-                f"Si no hay texto, usa 'indeterminado'. Si el lugar es indeterminado, busca en el título: {titulo}. "
-                f"Si no hay información en el título, devuelve 'indeterminado' para lugar y 0 para magnitud. "
-                f"Si hay múltiples lugares, elige el más relevante. "
-                f"Si hay un lugar, entrégame las coordenadas de latitud y longitud. "
-                f"Devuelve solo los valores en el orden correcto, sin explicaciones."
-            )
-
-            response = model.generate_content(prompt)
-
-            if "[" in response.text and "]" in response.text:
-                resultado = response.text.split("[")[1].split("]")[0].split(",")
-                resultado = [item.strip() for item in resultado]
-                while len(resultado) < 4:
-                    resultado.append("0")
-            else:
-                resultado = ["indeterminado", "0", "0", "0"]
+    df = df.reset_index(drop=True)
+    if "fecha_hora_texto" not in df.columns:  # Reutilizar la fecha extraída en load_data_reddit
+        df["fecha_hora_texto"] = extraer_fecha_hora_texto(df["texto_post"])
 
-        except Exception as e:
-            print(f"Error procesando fila {index}: {e}")
-            resultado = ["indeterminado", "0", "0", "0"]
-            fecha_texto = None
-            hora_texto = None
+    bot = extractor_bot.extraer_posts_bot(df)  # Extracción determinista de los posts de BrainstormBot
+    parseados = bot[bot["parseado"]]
+    resultados = {
+        indice: [lugar, str(magnitud)]
+        for indice, lugar, magnitud in zip(parseados.index, parseados["ciudad_o_pais"], parseados["magnitud"])
+    }
+    geocoder.aprender_lugares(df.loc[parseados.index, "id"] if "id" in df.columns else pd.Series(parseados.index, index=parseados.index),  # Lugares nuevos a data/lugares_aprendidos.csv
+                              parseados["ciudad_o_pais"], parseados["latitud"], parseados["longitud"])
+    print(f"Extractor de BrainstormBot: {len(resultados)} de {len(df)} posts resueltos sin IA")
 
-        resultados_ciudad.append(resultado[0])
-        resultados_magnitud.append(resultado[1])
-        resultados_latitud.append(resultado[2])
-        resultados_longitud.append(resultado[3])
-        resultados_fecha_texto.append(fecha_texto)
-        resultados_hora_texto.append(hora_texto)
+    ids_post = df["id"] if "id" in df.columns else pd.Series([None] * len(df), index=df.index)
+    claves = {
+        indice: cache_extraccion.clave_cache(id_post, titulo, texto, VERSION_EXTRACCION)
+        for indice, id_post, titulo, texto in zip(df.index, ids_post, df["titulo"], df["texto_post"])
+        if indice not in resultados
+    }
+    en_cache = cache_extraccion.leer_cache(list(claves.values()))
+    resultados.update({indice: en_cache[clave] for indice, clave in claves.items() if clave in en_cache})
+    print(f"Cache de extracciones: {len(resultados) - len(parseados)} aciertos, {len(df) - len(resultados)} posts por consultar")
 
-        if (index + 1) % 5 == 0:  # Mostrar progreso
-            print(f"Procesados {index + 1} de {len(df)} posts...")
+    posts = [  # Solo los posts sin resultado en cache van al modelo
+        (indice, texto, titulo)
+        for indice, texto, titulo in zip(df.index, df["texto_post"], df["titulo"])
+        if indice not in resultados
+    ]
+    if posts:
+        resultados.update(asyncio.run(extraer_posts(crear_pool_claves(), posts, tamano_lote)))
 
-        time.sleep(4) 
+    cache_extraccion.guardar_cache(  # Guardar solo las respuestas válidas del modelo
+        [(claves[indice], ids_post[indice], resultados[indice]) for indice, _, _ in posts if resultados[indice] is not None],
+        VERSION_EXTRACCION
+    )
+
+    resultados = {indice: resultado if resultado is not None else list(RESULTADO_VACIO) for indice, resultado in resultados.items()}
+
+    resultados_ciudad = [resultados[indice][0] for indice in df.index]
+    resultados_magnitud = [resultados[indice][1] for indice in df.index]
 
     df["ciudad_o_pais"] = resultados_ciudad  # Añadir resultados al DataFrame
     
     df["magnitud"] = pd.Series(pd.to_numeric(resultados_magnitud, errors="coerce")).fillna(0)  # Convertir a Series primero, luego aplicar fillna
-    df["latitud"] = pd.Series(pd.to_numeric(resultados_latitud, errors="coerce")).fillna(0)
-    df["longitud"] = pd.Series(pd.to_numeric(resultados_longitud, errors="coerce")).fillna(0)
-    
-    df["fecha_texto"] = resultados_fecha_texto  # Añadir fechas y horas extraídas del texto
-    df["hora_texto"] = resultados_hora_texto
+
+    coordenadas = geocoder.geocodificar(df["ciudad_o_pais"])  # Coordenadas desde el gazetteer; las de BrainstormBot se usan tal cual
+    df["latitud"] = parseados["latitud"].reindex(df.index).fillna(coordenadas["latitud"])  # NaN si el lugar no está en el gazetteer
+    df["longitud"] = parseados["longitud"].reindex(df.index).fillna(coordenadas["longitud"])
+    df["tipo_magnitud"] = bot["tipo_magnitud"]
     
-    mask_fecha_texto = df["fecha_texto"].notna()  # Actualizar fecha_crea y hora_crea si se encontró en el texto
+    mask_fecha_texto = df["fecha_hora_texto"].notna()  # Actualizar fecha_crea y hora_crea si se encontró en el texto
     if mask_fecha_texto.any():
-        df.loc[mask_fecha_texto, "fecha_crea"] = df.loc[mask_fecha_texto, "fecha_texto"]
-        df.loc[mask_fecha_texto, "hora_crea"] = df.loc[mask_fecha_texto, "hora_texto"]
+        df.loc[mask_fecha_texto, "fecha_crea"] = df.loc[mask_fecha_texto, "fecha_hora_texto"].dt.strftime("%Y-%m-%d")
+        df.loc[mask_fecha_texto, "hora_crea"] = df.loc[mask_fecha_texto, "fecha_hora_texto"].dt.strftime("%H:%M:%S")
     
-    df = df.drop(columns=["fecha_texto", "hora_texto"], errors="ignore")  # Eliminar columnas temporales
+    df = df.drop(columns=["fecha_hora_texto"], errors="ignore")  # Eliminar columna temporal
 
     df["hora"] = df["fecha_creacion"].dt.strftime("%Y-%m-%d %H:%M:%S")  # Crear columna hora con formato consistente
     
@@ -214,68 +398,32 @@ def procesar_con_gemini(df):
 
 def combinar_datos(df_nuevo):
     """
-    Combina datos nuevos procesados con datos existentes, eliminando duplicados
-    y manteniendo consistencia en tipos de datos y formatos de fecha.
+    Agrega los datos nuevos procesados al histórico de forma incremental: solo
+    los posts cuyo id de Reddit no está en el índice del almacén se escriben,
+    como nuevos segmentos de su partición mensual (ver almacen.py). El histórico
+    existente no se vuelve a leer ni a reescribir.
     
     Args:
         df_nuevo (pandas.DataFrame): DataFrame con nuevos datos procesados
         
     Returns:
-        pandas.DataFrame: DataFrame combinado, filtrado y ordenado por fecha
+        pandas.DataFrame: Posts nuevos efectivamente agregados al histórico
     """
-    file_path = os.path.join(os.getcwd(), "data", "Earthquakes_posts_new.csv")
-
-    if os.path.exists(file_path):
-        df_existente = pd.read_csv(file_path)  # Leer datos existentes
-        
-        df_existente["fecha_creacion"] = pd.to_datetime(df_existente["fecha_creacion"], errors="coerce")  # Convertir fecha_creacion a datetime en df_existente y asegurar que sea tz-naive
-        
-        if df_existente["fecha_creacion"].dt.tz is not None:  # Convertir fechas con zona horaria a tz-naive
-            df_existente["fecha_creacion"] = df_existente["fecha_creacion"].dt.tz_localize(None)
-        
-        if df_nuevo["fecha_creacion"].dt.tz is not None:  # Asegurar que fecha_creacion en df_nuevo también sea tz-naive
-            df_nuevo["fecha_creacion"] = df_nuevo["fecha_creacion"].dt.tz_localize(None)
-        
-        columnas_requeridas = ["fecha_crea", "hora_crea", "ciudad_o_pais", "magnitud",   # Asegurar que todas las columnas necesarias existan en df_existente
-                             "latitud", "longitud", "hora"]
-        
-        for col in columnas_requeridas:
-            if col not in df_existente.columns:
-                if col == "fecha_crea":
-                    df_existente["fecha_crea"] = df_existente["fecha_creacion"].dt.strftime("%Y-%m-%d")
-                elif col == "hora_crea":
-                    df_existente["hora_crea"] = df_existente["fecha_creacion"].dt.strftime("%H:%M:%S")
-                elif col == "hora":
-                    df_existente["hora"] = df_existente["fecha_creacion"].dt.strftime("%Y-%m-%d %H:%M:%S")
-                elif col in ["magnitud", "latitud", "longitud"]:
-                    df_existente[col] = 0
-                else:
-                    df_existente[col] = ""
-        
-        for col in ["magnitud", "latitud", "longitud"]:  # Asegurar tipos de datos consistentes
-            df_existente[col] = pd.to_numeric(df_existente[col], errors="coerce").fillna(0)
-            df_nuevo[col] = pd.to_numeric(df_nuevo[col], errors="coerce").fillna(0)
-        
-        df_combinado = pd.concat([df_existente, df_nuevo], ignore_index=True)  # Combinar DataFrames
-        
-        df_combinado = df_combinado.drop_duplicates(subset=["titulo"], keep="first")  # Eliminar duplicados basados en título
-        df_combinado = df_combinado[df_combinado["magnitud"] > 1 ].reset_index(drop=True)  # eliminar filas con magnitud <= 1 
-        df_combinado = df_combinado[df_combinado["magnitud"] < 15].reset_index(drop=True)  # eliminar filas con magnitud > 15
-        
-    else:
-        df_combinado = df_nuevo
+    df_nuevo = df_nuevo.copy()
+    df_nuevo["fecha_creacion"] = pd.to_datetime(df_nuevo["fecha_creacion"], errors="coerce")
+    if df_nuevo["fecha_creacion"].dt.tz is not None:  # Asegurar que fecha_creacion en df_nuevo sea tz-naive
+        df_nuevo["fecha_creacion"] = df_nuevo["fecha_creacion"].dt.tz_localize(None)
 
-    df_combinado["fecha_creacion"] = pd.to_datetime(df_combinado["fecha_creacion"], errors="coerce")  # Asegurar que todas las fechas son tz-naive antes de ordenar
-    if df_combinado["fecha_creacion"].dt.tz is not None:
-        df_combinado["fecha_creacion"] = df_combinado["fecha_creacion"].dt.tz_localize(None)
-    
-    df_combinado = df_combinado.sort_values("fecha_creacion", ascending=False)  # Ordenar por fecha más reciente
+    df_nuevo["magnitud"] = pd.to_numeric(df_nuevo["magnitud"], errors="coerce").fillna(0)  # Asegurar tipos de datos consistentes
+    for col in ["latitud", "longitud"]:  # Coordenadas sin geocodificar quedan como NaN en vez de (0, 0)
+        df_nuevo[col] = pd.to_numeric(df_nuevo[col], errors="coerce")
 
+    df_nuevo = df_nuevo[(df_nuevo["magnitud"] > 1) & (df_nuevo["magnitud"] < 15)]  # eliminar filas con magnitud <= 1 o >= 15
 
-    df_combinado.to_csv(file_path, index=False)  # Guardar datos combinados
-    print(f"Datos combinados - shape: {df_combinado.shape}")
+    df_agregado = almacen.agregar_posts(df_nuevo)  # Escribir solo los posts no vistos
+    print(f"Datos combinados - {len(df_agregado)} posts nuevos de {len(df_nuevo)}")
     
-    return df_combinado
+    return df_agregado
 
 def procesar_y_limpiar_datos():
     """
@@ -283,7 +431,7 @@ def procesar_y_limpiar_datos():
     carga desde Reddit, procesamiento con IA, y combinación con datos existentes.
     
     Returns:
-        pandas.DataFrame: DataFrame final con todos los datos procesados y combinados
+        pandas.DataFrame: Posts nuevos procesados y agregados al histórico
         
     Raises:
         Exception: Si ocurre algún error durante el procesamiento
@@ -0,0 +1,125 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+RUTA_VOLCANES = os.path.join("data", "volcanoes_selected_columns.csv")
+RADIO_TIERRA_KM = 6371.0088
+
+# Volcanes con coordenadas válidas, como arreglos compactos listos para cálculos espaciales
+Volcanes = namedtuple("Volcanes", ["latitud", "longitud", "nombres", "mtime"])
+
+_volcanes = {}  # Cache de los volcanes cargados: {ruta: Volcanes}
+_lock = threading.Lock()
+
+
+def cargar_volcanes(ruta=None):
+    """
+    Carga los volcanes de data/volcanoes_selected_columns.csv descartando las
+    filas sin coordenadas. Los datos se guardan en memoria, compartidos por
+    todas las sesiones, y solo se recargan si el archivo cambia.
+
+    Args:
+        ruta (str): Ruta del archivo de volcanes (por defecto data/volcanoes_selected_columns.csv)
+
+    Returns:
+        Volcanes: latitud y longitud (numpy.ndarray float64), nombres
+                  (numpy.ndarray de str) y mtime del archivo, o None si no existe
+    """
+    ruta = ruta or os.path.join(os.getcwd(), RUTA_VOLCANES)
+    if not os.path.exists(ruta):
+        return None
+
+    mtime = os.path.getmtime(ruta)
+    with _lock:
+        if ruta in _volcanes and _volcanes[ruta].mtime == mtime:
+            return _volcanes[ruta]
+
+    df = pd.read_csv(ruta, usecols=["Latitude", "Longitude", "ciudad_o_pais"])
+    df = df.dropna(subset=["Latitude", "Longitude"])
+    df = df[df["Latitude"].between(-90, 90) & df["Longitude"].between(-180, 180)]
+    volcanes = Volcanes(
+        latitud=df["Latitude"].to_numpy(dtype=np.float64),
+        longitud=df["Longitude"].to_numpy(dtype=np.float64),
+        nombres=df["ciudad_o_pais"].fillna("").astype(str).to_numpy(),
+        mtime=mtime,
+    )
+    with _lock:
+        _volcanes[ruta] = volcanes
+    return volcanes
+
+
+def tabla_volcanes(volcanes=None):
+    """
+    Devuelve los volcanes como DataFrame con las columnas que usan los mapas.
+
+    Args:
+        volcanes (Volcanes): Volcanes ya cargados; None para cargar los de data/
+
+    Returns:
+        pandas.DataFrame: Columnas latitud, longitud y ciudad_o_pais (vacío si no hay archivo)
+    """
+    volcanes = volcanes or cargar_volcanes()
+    if volcanes is None:
+        return pd.DataFrame(columns=["latitud", "longitud", "ciudad_o_pais"])
+    return pd.DataFrame({"latitud": volcanes.latitud, "longitud": volcanes.longitud, "ciudad_o_pais": volcanes.nombres})
+
+
+def distancia_km(latitud, longitud, latitud_punto, longitud_punto):
+    """
+    Calcula la distancia de gran círculo (haversine) entre coordenadas y un punto.
+
+    Args:
+        latitud (float o numpy.ndarray): Latitudes en grados
+        longitud (float o numpy.ndarray): Longitudes en grados
+        latitud_punto (float): Latitud del punto en grados
+        longitud_punto (float): Longitud del punto en grados
+
+    Returns:
+        float o numpy.ndarray: Distancias en kilómetros
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (latitud, longitud, latitud_punto, longitud_punto))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _vectores_unitarios(latitud, longitud):
+    lat, lon = np.radians(latitud), np.radians(longitud)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def volcan_mas_cercano(latitud, longitud, volcanes=None, bloque=4096):
+    """
+    Calcula para cada coordenada el volcán más cercano y su distancia, de forma
+    vectorizada por bloques: sobre vectores unitarios, el volcán más cercano es
+    el de mayor producto punto, así cada bloque es una multiplicación de matrices.
+
+    Args:
+        latitud (array-like): Latitudes en grados
+        longitud (array-like): Longitudes en grados
+        volcanes (Volcanes): Volcanes ya cargados; None para cargar los de data/
+        bloque (int): Coordenadas por bloque, para acotar la memoria usada
+
+    Returns:
+        tuple: (distancias en km, índices del volcán en volcanes), ambos
+               numpy.ndarray; distancia NaN e índice -1 si la coordenada falta
+               o no hay volcanes
+    """
+    latitud = np.asarray(pd.to_numeric(pd.Series(latitud), errors="coerce"), dtype=np.float64)
+    longitud = np.asarray(pd.to_numeric(pd.Series(longitud), errors="coerce"), dtype=np.float64)
+    distancias = np.full(len(latitud), np.nan)
+    indices = np.full(len(latitud), -1, dtype=np.int64)
+    volcanes = volcanes or cargar_volcanes()
+    validas = np.flatnonzero(~np.isnan(latitud) & ~np.isnan(longitud))
+    if volcanes is None or len(volcanes.latitud) == 0 or len(validas) == 0:
+        return distancias, indices
+
+    puntos_volcanes = _vectores_unitarios(volcanes.latitud, volcanes.longitud).T
+    for inicio in range(0, len(validas), bloque):
+        filas = validas[inicio:inicio + bloque]
+        productos = _vectores_unitarios(latitud[filas], longitud[filas]) @ puntos_volcanes
+        cercano = productos.argmax(axis=1)
+        indices[filas] = cercano
+        distancias[filas] = distancia_km(latitud[filas], longitud[filas], volcanes.latitud[cercano], volcanes.longitud[cercano])
+    return distancias, indices